@@ -1,23 +1,28 @@
 import streamlit as st
 import polars as pl
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
-import tracemalloc
-import psutil
-import os
 
 from warnings import filterwarnings
 filterwarnings("ignore")
 
-# Add at the very top after imports
-if 'memory_started' not in st.session_state:
-    tracemalloc.start()
-    st.session_state.memory_started = True
-    st.session_state.snapshots = []
+from export_potential.app_index import read_indexed
+from export_potential.app_store import current_version, read_manifest, read_table, table_hashes
+from export_potential.codes import decode
+from export_potential.config import show_memory
+from export_potential.formatting import format_contabil
 
+# psutil e tracemalloc só são importados (e o tracemalloc só é ligado) quando a memória é medida,
+# ou seja, com EXPORT_POTENTIAL_SHOW_MEMORY=1
 def show_memory_usage(label=""):
+    import os
+    import tracemalloc
+    import psutil
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    if 'snapshots' not in st.session_state:
+        st.session_state.snapshots = []
+
     current, peak = tracemalloc.get_traced_memory()
     process = psutil.Process(os.getpid())
     
@@ -39,6 +44,9 @@ if 'last_memory' not in st.session_state:
     st.session_state.last_memory = None
 
 def show_memory_delta(label=""):
+    import os
+    import psutil
+
     process = psutil.Process(os.getpid())
     current_mb = process.memory_info().rss / 1024 / 1024
     
@@ -80,73 +88,101 @@ st.set_page_config(
     layout="wide"
 )
 
-### FUNÇÔES
-
-def format_contabil(value):
-    if value >= 1e9:
-        return f"{value/1e9:,.1f} bi".replace(",", "X").replace(".", ",").replace("X", ".")
-    elif value >= 1e6:
-        return f"{value/1e6:,.1f} mi".replace(",", "X").replace(".", ",").replace("X", ".")
-    elif value >= 1e3:
-        return f"{value/1e3:,.1f} mil".replace(",", "X").replace(".", ",").replace("X", ".")
-    else:
-        return f"{value:,.1f}".replace(",", "X").replace(".", ",").replace("X", ".")
-
-def format_decimal(value, decimals=1):
-    return f"{value:.{decimals}f}".replace(".", ",")
-
-
 ######## Loading the data ########
+# Cada tabela é lida na primeira vez que uma aba precisa dela, só com as colunas que a aba usa.
+# As tabelas vêm de app/data/store/ (make_app_store) em Arrow IPC e são mapeadas em memória,
+# então as sessões e os processos do app compartilham as mesmas páginas.
+# Cada loader recebe os hashes das suas tabelas no manifest da versão publicada: uma publicação
+# nova recarrega na hora só as tabelas que mudaram, e nada é relido enquanto não houver outra.
+# Hashes e tabelas vêm da mesma versão (_version fica fora da chave do cache), mesmo que uma
+# publicação aconteça durante a leitura.
+def load_versioned(loader, *names):
+    """Chama ``loader`` com os hashes de ``names`` e a versão de onde eles foram lidos."""
+    version = current_version()
+    # make_app_store publica sem as tabelas cujo Parquet não existe em app/data
+    published = read_manifest(version=version)['tables']
+    missing = [name for name in names if name not in published]
+    if missing:
+        st.warning(f"Os dados desta aba não foram publicados ({', '.join(missing)}).")
+        st.stop()
+    return loader(table_hashes(*names, version=version), version)
+
+try:
+    current_version()
+except FileNotFoundError:
+    # O store não é versionado no git: é publicado a partir dos Parquet de app/data
+    st.error(
+        "Os dados do app ainda não foram publicados em app/data/store. "
+        "Rode `python -m export_potential.make_app_store` na raiz do projeto e recarregue a página."
+    )
+    st.stop()
+
 ### Munic and VP list ###
-df_munic_vp = pl.read_excel(references / 'munic_vp.xlsx')
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_munic_vp(sha256, _version):
+    return read_table('munic_vp', version=_version)
+
+df_munic_vp = load_versioned(load_munic_vp, 'munic_vp')
 
 vp = df_munic_vp['vp'].unique().to_list()
 munic = df_munic_vp['munic'].unique().to_list()
 
 ### EPI scores SH6 ###
-@st.cache_resource(ttl=1800, show_spinner=False)
-def load_epi_scores_sh6():
-    return pl.read_parquet(app / 'data' / 'epi_scores_sh6.parquet')
-df_epi_sh6 = load_epi_scores_sh6()
-
-df_epi_sh6 = df_epi_sh6.with_columns(
-    pl.col("epi_score_normalized").round(3)
-)
-@st.cache_resource(ttl=1800, show_spinner=False)
-def load_epi_countries():
-    return pl.read_parquet(app / 'data' / 'epi_scores_countries.parquet')
-df_epi_countries = load_epi_countries()
-
-df_epi_countries = df_epi_countries.with_columns(
-    pl.col("epi_score_normalized").round(3)
-)
-### EPI scores ###
-
-@st.cache_resource(ttl=1800, show_spinner=False)
-def load_epi_scores():
-    return pl.read_parquet(app / 'data' / 'epi_scores_processed.parquet')
-df_epi = load_epi_scores()
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_epi_scores_sh6(sha256, _version):
+    df = read_table(
+        'epi_scores_sh6',
+        columns=['sh6', 'product_description_br', 'sc_comp', 'color', 'epi_score_normalized', 'categoria'],
+        version=_version
+    )
+    return decode(df).with_columns(pl.col("epi_score_normalized").round(3))
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_epi_countries(sha256, _version):
+    df = read_table(
+        'epi_scores_countries',
+        columns=['importer', 'importer_name', 'epi_score_normalized', 'categoria'],
+        version=_version
+    )
+    return decode(df).with_columns(pl.col("epi_score_normalized").round(3))
+
+### EPI scores, markets and competitors: sorted by product, read with their offsets ###
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_epi_scores(sha256, _version):
+    return read_indexed(
+        'epi_scores',
+        columns=['importer', 'importer_name', 'sh6_product', 'bilateral_exports_sc_sh6',
+                 'epi_score_normalized', 'categoria'],
+        version=_version
+    )
 
 ### EPI scores SC Competitiva ###
-@st.cache_resource(ttl=1800, show_spinner=False)
-def load_epi_scores_sc_comp():
-    return pl.read_parquet(app / 'data' / 'epi_scores_sc_comp.parquet')
-df_epi_sc_comp = load_epi_scores_sc_comp()
-
-df_epi_sc_comp = df_epi_sc_comp.with_columns(
-    pl.col("epi_score_normalized").round(3)
-)
-
-@st.cache_resource(ttl=1800, show_spinner=False)
-def load_markets():
-    return pl.read_parquet(app / 'data' / 'app_dataset_processed.parquet')
-df_markets = load_markets()
-
-@st.cache_resource(show_spinner=False)
-def load_competitors():
-    return pl.read_parquet(app / 'data' / 'df_competitors.parquet')
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_epi_scores_sc_comp(sha256, _version):
+    df = read_table(
+        'epi_scores_sc_comp',
+        columns=['sc_comp', 'epi_score_normalized'],
+        version=_version
+    )
+    return decode(df).with_columns(pl.col("epi_score_normalized").round(3))
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_markets(sha256, _version):
+    return read_indexed(
+        'markets',
+        columns=['sh6_product', 'importer_name', 'value', 'value_contabil', 'market_share',
+                 'cagr_5y_adj', 'share_brazil', 'share_sc', 'dist'],
+        version=_version
+    )
 
-df_competitors = load_competitors()
+@st.cache_resource(max_entries=1, show_spinner=False)
+def load_competitors(sha256, _version):
+    return read_indexed(
+        'competitors',
+        columns=['exporter', 'exporter_name', 'importer_name', 'sh6', 'sh6_product', 'product_description_br',
+                 'value', 'value_contabil', 'importer_sh6_share', 'cagr_5y_adj'],
+        version=_version
+    )
 
 ################## APP ########################
 #### SIDEBAR ####
@@ -163,11 +199,12 @@ with st.sidebar:
     st.image(app / "logo_dark.png")
     st.markdown("</div>", unsafe_allow_html=True)
 
-    import psutil
-    import os
-    process = psutil.Process(os.getpid())
-    memory_mb = process.memory_info().rss / 1024 / 1024
-    st.sidebar.metric("Memory Usage", f"{memory_mb:.2f} MB")
+    if show_memory:
+        import psutil
+        import os
+        process = psutil.Process(os.getpid())
+        memory_mb = process.memory_info().rss / 1024 / 1024
+        st.sidebar.metric("Memory Usage", f"{memory_mb:.2f} MB")
 
 st.title("Potencial de exportações")
 
@@ -178,13 +215,27 @@ st.markdown(
     unsafe_allow_html=True
 )
 
-tab1, tab2, tab3, tab4, tab5 = st.tabs(['Visão geral', 'Produtos e mercados', 'Fornecedores', 'Mapa tarifário', 'Metodologia'])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(
+    ['Visão geral', 'Produtos e mercados', 'Fornecedores', 'Mapa tarifário', 'Metodologia'],
+    key='aba',
+    on_change='rerun'
+)
+
+# Cada aba é um st.fragment: mudar um filtro reexecuta só a aba em que ele está.
+# Só a aba aberta é executada, então os dados e o plotly de uma aba são carregados quando ela é aberta.
 
 
 
 
 #### TAB 1 - PRODUTOS ####
-with tab1:
+@st.fragment
+def tab_visao_geral():
+    import plotly.express as px
+
+    df_epi_sh6 = load_versioned(load_epi_scores_sh6, 'epi_scores_sh6')
+    df_epi_countries = load_versioned(load_epi_countries, 'epi_scores_countries')
+    df_epi_sc_comp = load_versioned(load_epi_scores_sc_comp, 'epi_scores_sc_comp')
+
     ### FIRST SECTION
     col1, col2 = st.columns([2, 1])
     with col1:
@@ -311,6 +362,10 @@ with tab1:
     st.markdown("<hr style='margin-top: -50px; margin-bottom: 0;'>", unsafe_allow_html=True)
     st.markdown("<div style='margin-top: -55px;'></div><span style='font-size:14px;'><b>Fonte:</b> CEPII (2023) e Observatório FIESC (2025).</span>", unsafe_allow_html=True)
 
+if tab1.open:
+    with tab1:
+        tab_visao_geral()
+
 
 
 
@@ -321,19 +376,28 @@ with tab1:
 
 
 #### TAB 2 - PRODUTOS E MERCADOS ####
-with tab2:
-    sh6_options = sorted([opt for opt in df_epi["sh6_product"].unique().to_list() if opt is not None])
+@st.fragment
+def tab_produtos_mercados():
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    epi = load_versioned(load_epi_scores, 'epi_scores', 'epi_scores.offsets')
+    markets = load_versioned(load_markets, 'markets', 'markets.offsets')
+
+    # Os produtos do índice já estão em ordem
+    sh6_options = [opt for opt in epi.index["sh6_product"].to_list() if opt is not None]
     selected_sh6 = st.selectbox("**Selecione o código SH6:**", sh6_options, key="sh6_selectbox_tab2")
 
     ### Columns for layout
     col1, col2 = st.columns([0.8, 1])
     
     with col1:
-        df_selected = df_epi.filter(pl.col("sh6_product") == selected_sh6).sort("epi_score_normalized", descending=True)
+        # As linhas de cada produto já vêm em ordem decrescente de Índice PE
+        df_selected = decode(epi.rows(selected_sh6))
         df_selected_pd = df_selected.to_pandas().head(25).sort_values("epi_score_normalized", ascending=True)
         df_selected_pd_map = df_selected.to_pandas().sort_values("epi_score_normalized", ascending=False)
 
-        df_selected_markets = df_markets.filter(pl.col("sh6_product") == selected_sh6).sort("value", descending=True)
+        df_selected_markets = decode(markets.rows(selected_sh6))
 
         fig = go.Figure()
 
@@ -478,6 +542,10 @@ with tab2:
     st.markdown("<hr style='margin-top: -50px; margin-bottom: 0;'>", unsafe_allow_html=True)
     st.markdown("<div style='margin-top: -55px;'></div><span style='font-size:14px;'><b>Fonte:</b> CEPII (2023) e Observatório FIESC (2025).</span>", unsafe_allow_html=True)
 
+if tab2.open:
+    with tab2:
+        tab_produtos_mercados()
+
 
 
 
@@ -486,26 +554,32 @@ with tab2:
 
     
 #### TAB 3 - FORNECEDORES ####
-with tab3:
+@st.fragment
+def tab_fornecedores():
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    competitors = load_versioned(load_competitors, 'competitors', 'competitors.offsets')
+
     # --- Cache unique values ---
     @st.cache_data(show_spinner=False)
     def get_unique_options(df: pl.DataFrame):
         """
         Return sorted unique lists for importer_name and sh6_product.
-        This will only recompute when df_competitors changes.
+        This will only recompute when the competitors index changes.
         """
         countries = (
-            df.select(pl.col("importer_name").drop_nulls().unique().sort())
+            df.select(pl.col("importer_name").cast(pl.String).drop_nulls().unique().sort())
             .to_series().to_list()
         )
         products = (
-            df.select(pl.col("sh6_product").drop_nulls().unique().sort())
+            df.select(pl.col("sh6_product").cast(pl.String).drop_nulls().unique().sort())
             .to_series().to_list()
         )
         return countries, products
     
 
-    countries, products = get_unique_options(df_competitors)
+    countries, products = get_unique_options(competitors.index)
     col1, col2 = st.columns([0.8, 1])
 
     with col1:
@@ -522,21 +596,13 @@ with tab3:
             key="product_selectbox_tab3"
         )
 
-    df_competitors_filtered = (
-        df_competitors
-        .filter(
-            (pl.col("importer_name") == sel_country) &
-            (pl.col("sh6_product") == sel_product)
-        )
-        .sort("value", descending=True)
-    )
+    # Fornecedores do par (produto, país), já em ordem decrescente de valor
+    df_competitors_filtered = decode(competitors.rows(sel_product, sel_country))
 
     total_imports = df_competitors_filtered.select(pl.col("value").sum()).item()
 
     # ==== FIRST SECTION (fast + categorical-proof via graph_objects) ====
-    import plotly.graph_objects as go
     from itertools import cycle
-    import polars as pl
 
     col3, col4 = st.columns([2, 1.25])
 
@@ -709,234 +775,258 @@ with tab3:
     st.markdown("<hr style='margin-top: -50px; margin-bottom: 0;'>", unsafe_allow_html=True)
     st.markdown("<div style='margin-top: -55px;'></div><span style='font-size:14px;'><b>Fonte:</b> CEPII (2023) e Observatório FIESC (2025).</span>", unsafe_allow_html=True)
 
-    with tab4:
-        from typing import Dict, List, Tuple
-
-        #ARQ          = "df_tariff_brazil.parquet"   # caminho do .parquet
-        VAL_COL      = "Tariff_Final"
-        REPORTER_COL = "Reporter Name"
-        PRODUCT_COL  = "Product Name"
-        YEAR_COL     = "Tariff_Year"
-
-        # Nomes para o Plotly
-        NAME_FIX: Dict[str, str] = {
-            "United States of America": "United States",
-            "Russian Federation": "Russia",
-            "Viet Nam": "Vietnam",
-            "Korea, Republic of": "South Korea",
-            "Iran, Islamic Republic of": "Iran",
-            "Czech Republic": "Czechia",
-            "Türkiye": "Turkey",
-            "Syrian Arab Republic": "Syria",
-            "Lao People's Democratic Republic": "Laos",
-            "Venezuela (Bolivarian Republic of)": "Venezuela",
-            "Bolivia (Plurinational State of)": "Bolivia",
-            "Tanzania, United Republic of": "Tanzania",
-            "Congo, Democratic Republic of the": "Democratic Republic of the Congo",
-            "Congo": "Republic of the Congo",
-            "Moldova, Republic of": "Moldova",
-            "Brunei Darussalam": "Brunei",
-            "Taiwan, Province of China": "Taiwan",
-            "Hong Kong, China": "Hong Kong",
-            "Palestine, State of": "Palestine",
-            "Côte d'Ivoire": "Ivory Coast",
-        }
+if tab3.open:
+    with tab3:
+        tab_fornecedores()
 
-        def validar_colunas(df: pl.DataFrame, cols: List[str]) -> None:
-            faltantes = [c for c in cols if c not in df.columns]
-            if faltantes:
-                raise KeyError(f"As colunas obrigatórias estão faltando no arquivo: {faltantes}")
 
-        @st.cache_data(show_spinner=True)
-        def carregar_filtrar_selecionar() -> pd.DataFrame:
-            """Lê parquet e pega o ANO MAIS RECENTE por (Reporter, Product)."""
-            df = pl.read_parquet(app / 'data' / 'df_tariff_brazil.parquet')
 
-            validar_colunas(df, [REPORTER_COL, PRODUCT_COL, YEAR_COL, VAL_COL])
 
-            # Desconsiderar o Brasil como reporter
-            df = df.filter(pl.col(REPORTER_COL) != "Brazil")
 
-            # ordenar por (produto, país, ano desc) e manter a primeira ocorrência
-            df = (
-                df.sort(by=[PRODUCT_COL, REPORTER_COL, YEAR_COL], descending=[False, False, True])
-                .unique(subset=[REPORTER_COL, PRODUCT_COL], keep="first")
-                .select([REPORTER_COL, PRODUCT_COL, YEAR_COL, VAL_COL])
-            )
 
-            if df.is_empty():
-                raise ValueError("Após a seleção do ano mais recente, não há dados.")
-
-            pdf = df.to_pandas()
-            pdf["country_plotly"] = pdf[REPORTER_COL].replace(NAME_FIX)
-            pdf = pdf.dropna(subset=["country_plotly"])  # remove países sem mapeamento
-            return pdf
-
-        def make_figure_and_data(pdf: pd.DataFrame, produto_escolhido: str) -> Tuple[go.Figure, pd.DataFrame, pd.DataFrame]:
-            df_prod = pdf[pdf[PRODUCT_COL] == produto_escolhido].copy()
-
-            # Remove linhas onde o valor da tarifa (usado para 'size') é nulo
-            df_prod.dropna(subset=[VAL_COL], inplace=True)
-
-            # 1. DataFrame para países com tarifa > 0 (para as bolhas)
-            df_bolhas = df_prod[df_prod[VAL_COL] > 0].copy()
-
-            # 2. DataFrame para países com tarifa == 0 (para colorir de branco)
-            df_zeros = df_prod[df_prod[VAL_COL] == 0].copy()
-
-            # Inicia a figura com o mapa de bolhas (apenas para tarifas > 0)
-            fig = px.scatter_geo(
-                df_bolhas,
-                locations="country_plotly",
-                locationmode="country names",
-                color=VAL_COL,
-                size=VAL_COL,  # Tamanho da bolha também baseado no valor
-                hover_name=REPORTER_COL,
-                custom_data=[YEAR_COL, VAL_COL], # Passar nomes das colunas para o hover
-                color_continuous_scale="Blues",
-                projection="natural earth",
-                size_max=50, # Tamanho máximo da bolha
-                labels={VAL_COL: "Tarifa Final"},
-            )
 
-            # Atualiza o hovertemplate para o scatter_geo
-            fig.update_traces(
-                hovertext=df_bolhas[REPORTER_COL], # Garante que o nome do país esteja disponível
-                hovertemplate=(
-                    "<b>%{hovertext}</b><br>"
-                    "Ano: %{customdata[0]:.0f}<br>"
-                    "Tarifa Final: %{customdata[1]:.2f}<extra></extra>"
-                ),
-                marker=dict(line=dict(width=0.5, color='rgba(0,0,0,0.7)')),
-                selector=dict(type='scattergeo') # Aplica apenas à camada de bolhas
-            )
 
-            # Top 5 — apenas colocação e nome, sem bolinhas
-            top5 = df_bolhas.nlargest(5, VAL_COL).reset_index(drop=True)
+#### TAB 4 - MAPA TARIFÁRIO ####
+@st.fragment
+def tab_mapa_tarifario():
+    from typing import Dict, List, Tuple
+
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
 
-            fig.add_trace(go.Scattergeo(
-                locations=top5["country_plotly"],
-                locationmode="country names",
-                text=[f"<b>{i+1}º</b>" for i in top5.index],
-                mode="text",  # apenas texto
-                textposition="top center",
-                textfont=dict(size=14, color="white", family="Arial, sans-serif"),
-                showlegend=False,
-            ))
+    #ARQ          = "df_tariff_brazil.parquet"   # caminho do .parquet
+    VAL_COL      = "Tariff_Final"
+    REPORTER_COL = "Reporter Name"
+    PRODUCT_COL  = "Product Name"
+    YEAR_COL     = "Tariff_Year"
+
+    # Nomes para o Plotly
+    NAME_FIX: Dict[str, str] = {
+        "United States of America": "United States",
+        "Russian Federation": "Russia",
+        "Viet Nam": "Vietnam",
+        "Korea, Republic of": "South Korea",
+        "Iran, Islamic Republic of": "Iran",
+        "Czech Republic": "Czechia",
+        "Türkiye": "Turkey",
+        "Syrian Arab Republic": "Syria",
+        "Lao People's Democratic Republic": "Laos",
+        "Venezuela (Bolivarian Republic of)": "Venezuela",
+        "Bolivia (Plurinational State of)": "Bolivia",
+        "Tanzania, United Republic of": "Tanzania",
+        "Congo, Democratic Republic of the": "Democratic Republic of the Congo",
+        "Congo": "Republic of the Congo",
+        "Moldova, Republic of": "Moldova",
+        "Brunei Darussalam": "Brunei",
+        "Taiwan, Province of China": "Taiwan",
+        "Hong Kong, China": "Hong Kong",
+        "Palestine, State of": "Palestine",
+        "Côte d'Ivoire": "Ivory Coast",
+    }
 
-            # Layout escuro e barra de cores embaixo
-            fig.update_layout(
-                paper_bgcolor="#22232E",
-                plot_bgcolor="#22232E",
-                title=dict(
-                    text=f"Tarifas aplicadas ao Brasil por país — {produto_escolhido}",
-                    font=dict(color="white", size=18),
-                    x=0.5,
-                    xanchor="center",
-                ),
-                coloraxis_colorbar=dict(
-                    title=dict(text="Tarifa Final", font=dict(color="white")),
-                    orientation="h",
-                    x=0.5, xanchor="center",
-                    y=-0.08, yanchor="top",
-                    len=0.6,
-                    thickness=12,
-                    tickcolor="white",
-                    tickfont=dict(color="white"),
-                    outlinecolor="rgba(255,255,255,0.2)",
-                ),
-                margin=dict(l=0, r=0, t=70, b=0),
-                font=dict(color="white"),
-            )
+    def validar_colunas(colunas: List[str], cols: List[str]) -> None:
+        faltantes = [c for c in cols if c not in colunas]
+        if faltantes:
+            raise KeyError(f"As colunas obrigatórias estão faltando no arquivo: {faltantes}")
 
-            # Geo: Estilo escuro para o mapa base, similar à referência
-            fig.update_geos(
-                showocean=True, oceancolor="#22232E",
-                showland=True, landcolor="#595959",
-                showcountries=True, countrycolor="white",
-                showcoastlines=True, coastlinecolor="white",
-                countrywidth=0.2, coastlinewidth=0.2,
-                showframe=False,
-                bgcolor="#22232E",
-            )
+    @st.cache_data(max_entries=1, show_spinner=True)
+    def carregar_filtrar_selecionar(sha256, _version) -> pd.DataFrame:
+        """Lê a tabela de tarifas e pega o ANO MAIS RECENTE por (Reporter, Product)."""
+        df = read_table('df_tariff_brazil', version=_version)
 
-            return fig, df_bolhas, df_zeros
+        validar_colunas(df.columns, [REPORTER_COL, PRODUCT_COL, YEAR_COL, VAL_COL])
 
-        # ===========================
-        # UI
-        # ===========================
-        st.markdown(
-            "<h2 style='text-align:center; color:white; margin-top:0'>Mapa de tarifas aplicadas ao Brasil</h2>",
-            unsafe_allow_html=True,
+        # Só as colunas usadas no mapa e nas tabelas
+        df = df.select([REPORTER_COL, PRODUCT_COL, YEAR_COL, VAL_COL])
+
+        # Desconsiderar o Brasil como reporter
+        df = df.filter(pl.col(REPORTER_COL) != "Brazil")
+
+        # ordenar por (produto, país, ano desc) e manter a primeira ocorrência
+        df = (
+            df.sort(by=[PRODUCT_COL, REPORTER_COL, YEAR_COL], descending=[False, False, True])
+            .unique(subset=[REPORTER_COL, PRODUCT_COL], keep="first")
+            .select([REPORTER_COL, PRODUCT_COL, YEAR_COL, VAL_COL])
         )
 
-        try:
-            pdf = carregar_filtrar_selecionar()
-            produtos = sorted(pdf[PRODUCT_COL].dropna().astype(str).unique().tolist())
-            if not produtos:
-                st.warning("Não há valores em 'Product Name' após o filtro aplicado.")
-                st.stop()
-
-            c1, c2, c3 = st.columns([1, 2, 1])
-            with c2:
-                produto_escolhido = st.selectbox(
-                    "Produto (digite para buscar)",
-                    options=produtos,
-                    index=0,
-                    help="Selecione ou digite para pesquisar o produto",
-                )
+        if df.is_empty():
+            raise ValueError("Após a seleção do ano mais recente, não há dados.")
+
+        pdf = df.to_pandas()
+        pdf["country_plotly"] = pdf[REPORTER_COL].replace(NAME_FIX)
+        pdf = pdf.dropna(subset=["country_plotly"])  # remove países sem mapeamento
+        return pdf
+
+    def make_figure_and_data(pdf: pd.DataFrame, produto_escolhido: str) -> Tuple[go.Figure, pd.DataFrame, pd.DataFrame]:
+        df_prod = pdf[pdf[PRODUCT_COL] == produto_escolhido].copy()
+
+        # Remove linhas onde o valor da tarifa (usado para 'size') é nulo
+        df_prod.dropna(subset=[VAL_COL], inplace=True)
 
-            fig, df_com_tarifa, df_sem_tarifa = make_figure_and_data(pdf, produto_escolhido)
-            st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": True})
+        # 1. DataFrame para países com tarifa > 0 (para as bolhas)
+        df_bolhas = df_prod[df_prod[VAL_COL] > 0].copy()
 
-            st.caption(
-                "O tamanho e a cor da bolha representam o valor da Tarifa Final. Passe o mouse para ver os detalhes. "
-                "Os 5 maiores valores exibem rótulos fixos numerados por colocação."
+        # 2. DataFrame para países com tarifa == 0 (para colorir de branco)
+        df_zeros = df_prod[df_prod[VAL_COL] == 0].copy()
+
+        # Inicia a figura com o mapa de bolhas (apenas para tarifas > 0)
+        fig = px.scatter_geo(
+            df_bolhas,
+            locations="country_plotly",
+            locationmode="country names",
+            color=VAL_COL,
+            size=VAL_COL,  # Tamanho da bolha também baseado no valor
+            hover_name=REPORTER_COL,
+            custom_data=[YEAR_COL, VAL_COL], # Passar nomes das colunas para o hover
+            color_continuous_scale="Blues",
+            projection="natural earth",
+            size_max=50, # Tamanho máximo da bolha
+            labels={VAL_COL: "Tarifa Final"},
+        )
+
+        # Atualiza o hovertemplate para o scatter_geo
+        fig.update_traces(
+            hovertext=df_bolhas[REPORTER_COL], # Garante que o nome do país esteja disponível
+            hovertemplate=(
+                "<b>%{hovertext}</b><br>"
+                "Ano: %{customdata[0]:.0f}<br>"
+                "Tarifa Final: %{customdata[1]:.2f}<extra></extra>"
+            ),
+            marker=dict(line=dict(width=0.5, color='rgba(0,0,0,0.7)')),
+            selector=dict(type='scattergeo') # Aplica apenas à camada de bolhas
+        )
+
+        # Top 5 — apenas colocação e nome, sem bolinhas
+        top5 = df_bolhas.nlargest(5, VAL_COL).reset_index(drop=True)
+
+        fig.add_trace(go.Scattergeo(
+            locations=top5["country_plotly"],
+            locationmode="country names",
+            text=[f"<b>{i+1}º</b>" for i in top5.index],
+            mode="text",  # apenas texto
+            textposition="top center",
+            textfont=dict(size=14, color="white", family="Arial, sans-serif"),
+            showlegend=False,
+        ))
+
+        # Layout escuro e barra de cores embaixo
+        fig.update_layout(
+            paper_bgcolor="#22232E",
+            plot_bgcolor="#22232E",
+            title=dict(
+                text=f"Tarifas aplicadas ao Brasil por país — {produto_escolhido}",
+                font=dict(color="white", size=18),
+                x=0.5,
+                xanchor="center",
+            ),
+            coloraxis_colorbar=dict(
+                title=dict(text="Tarifa Final", font=dict(color="white")),
+                orientation="h",
+                x=0.5, xanchor="center",
+                y=-0.08, yanchor="top",
+                len=0.6,
+                thickness=12,
+                tickcolor="white",
+                tickfont=dict(color="white"),
+                outlinecolor="rgba(255,255,255,0.2)",
+            ),
+            margin=dict(l=0, r=0, t=70, b=0),
+            font=dict(color="white"),
+        )
+
+        # Geo: Estilo escuro para o mapa base, similar à referência
+        fig.update_geos(
+            showocean=True, oceancolor="#22232E",
+            showland=True, landcolor="#595959",
+            showcountries=True, countrycolor="white",
+            showcoastlines=True, coastlinecolor="white",
+            countrywidth=0.2, coastlinewidth=0.2,
+            showframe=False,
+            bgcolor="#22232E",
+        )
+
+        return fig, df_bolhas, df_zeros
+
+    # ===========================
+    # UI
+    # ===========================
+    st.markdown(
+        "<h2 style='text-align:center; color:white; margin-top:0'>Mapa de tarifas aplicadas ao Brasil</h2>",
+        unsafe_allow_html=True,
+    )
+
+    try:
+        pdf = load_versioned(carregar_filtrar_selecionar, 'df_tariff_brazil')
+        produtos = sorted(pdf[PRODUCT_COL].dropna().astype(str).unique().tolist())
+        if not produtos:
+            st.warning("Não há valores em 'Product Name' após o filtro aplicado.")
+            st.stop()
+
+        c1, c2, c3 = st.columns([1, 2, 1])
+        with c2:
+            produto_escolhido = st.selectbox(
+                "Produto (digite para buscar)",
+                options=produtos,
+                index=0,
+                help="Selecione ou digite para pesquisar o produto",
             )
-            
-            st.markdown("---")
-
-            # CSS para forçar o fundo das tabelas a ser igual ao do mapa
-            st.markdown("""
-            <style>
-                /* Alvo para o container do st.data_editor e a tabela interna */
-                .stDataFrame, .stDataFrame [data-testid="stTable"] {
-                    background-color: #22232E !important;
-                }
-                /* Cor do texto nos cabeçalhos das colunas */
-                .stDataFrame [data-testid="stTable"] .col_heading {
-                    color: white !important;
-                    background-color: #3a3c4d !important; /* Um tom ligeiramente diferente para o cabeçalho */
-                }
-                /* Cor do texto nas células de dados */
-                .stDataFrame [data-testid="stTable"] .cell-container {
-                    color: white !important;
-                    background-color: #22232E !important;
-                }
-            </style>
-            """, unsafe_allow_html=True)
-
-            # Cria duas colunas para as tabelas
-            col1, col2 = st.columns(2)
-
-            with col1:
-                st.markdown("<h5 style='text-align: center;'>Países com Tarifa (> 0%)</h5>", unsafe_allow_html=True)
-                df_tabela_com_tarifa = df_com_tarifa[[REPORTER_COL, YEAR_COL, VAL_COL]].rename(columns={REPORTER_COL: "País", YEAR_COL: "Ano", VAL_COL: "Tarifa (%)"})
-                df_tabela_com_tarifa = df_tabela_com_tarifa.sort_values(by="Tarifa (%)", ascending=False)
-                st.data_editor(df_tabela_com_tarifa, use_container_width=True, hide_index=True, disabled=True)
-
-            with col2:
-                st.markdown("<h5 style='text-align: center;'>Oportunidades (Tarifa Zero)</h5>", unsafe_allow_html=True)
-                df_tabela_sem_tarifa = df_sem_tarifa[[REPORTER_COL, YEAR_COL, VAL_COL]].rename(columns={REPORTER_COL: "País", YEAR_COL: "Ano", VAL_COL: "Tarifa (%)"})
-                df_tabela_sem_tarifa = df_tabela_sem_tarifa.sort_values(by="País")
-                st.data_editor(df_tabela_sem_tarifa, use_container_width=True, hide_index=True, disabled=True)
-
-
-        except FileNotFoundError:
-            st.error(f"Arquivo não encontrado: {ARQ}")
-        except KeyError as e:
-            st.error(f"Problema de colunas no dataset: {e}")
-        except ValueError as e:
-            st.error(str(e))
-        except Exception as e:
-            st.exception(e)
+
+        fig, df_com_tarifa, df_sem_tarifa = make_figure_and_data(pdf, produto_escolhido)
+        st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": True})
+
+        st.caption(
+            "O tamanho e a cor da bolha representam o valor da Tarifa Final. Passe o mouse para ver os detalhes. "
+            "Os 5 maiores valores exibem rótulos fixos numerados por colocação."
+        )
+        
+        st.markdown("---")
+
+        # CSS para forçar o fundo das tabelas a ser igual ao do mapa
+        st.markdown("""
+        <style>
+            /* Alvo para o container do st.data_editor e a tabela interna */
+            .stDataFrame, .stDataFrame [data-testid="stTable"] {
+                background-color: #22232E !important;
+            }
+            /* Cor do texto nos cabeçalhos das colunas */
+            .stDataFrame [data-testid="stTable"] .col_heading {
+                color: white !important;
+                background-color: #3a3c4d !important; /* Um tom ligeiramente diferente para o cabeçalho */
+            }
+            /* Cor do texto nas células de dados */
+            .stDataFrame [data-testid="stTable"] .cell-container {
+                color: white !important;
+                background-color: #22232E !important;
+            }
+        </style>
+        """, unsafe_allow_html=True)
+
+        # Cria duas colunas para as tabelas
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.markdown("<h5 style='text-align: center;'>Países com Tarifa (> 0%)</h5>", unsafe_allow_html=True)
+            df_tabela_com_tarifa = df_com_tarifa[[REPORTER_COL, YEAR_COL, VAL_COL]].rename(columns={REPORTER_COL: "País", YEAR_COL: "Ano", VAL_COL: "Tarifa (%)"})
+            df_tabela_com_tarifa = df_tabela_com_tarifa.sort_values(by="Tarifa (%)", ascending=False)
+            st.data_editor(df_tabela_com_tarifa, use_container_width=True, hide_index=True, disabled=True)
+
+        with col2:
+            st.markdown("<h5 style='text-align: center;'>Oportunidades (Tarifa Zero)</h5>", unsafe_allow_html=True)
+            df_tabela_sem_tarifa = df_sem_tarifa[[REPORTER_COL, YEAR_COL, VAL_COL]].rename(columns={REPORTER_COL: "País", YEAR_COL: "Ano", VAL_COL: "Tarifa (%)"})
+            df_tabela_sem_tarifa = df_tabela_sem_tarifa.sort_values(by="País")
+            st.data_editor(df_tabela_sem_tarifa, use_container_width=True, hide_index=True, disabled=True)
+
+
+    except FileNotFoundError:
+        st.error(f"Arquivo não encontrado: {ARQ}")
+    except KeyError as e:
+        st.error(f"Problema de colunas no dataset: {e}")
+    except ValueError as e:
+        st.error(str(e))
+    except Exception as e:
+        st.exception(e)
+
+if tab4.open:
+    with tab4:
+        tab_mapa_tarifario()
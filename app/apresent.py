@@ -17,6 +17,9 @@ import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
 
+from export_potential.codes import decode
+from export_potential.formatting import contabil, decimal, format_contabil
+
 
 # -----------------------------------------------------------------------------
 # Configuração Plotly para Jupyter
@@ -48,44 +51,21 @@ DATA_INTERIM = PROJECT_ROOT / 'data' / 'interim'
 REFERENCES = PROJECT_ROOT / 'references'
 
 
-def format_contabil(value: float) -> str:
-    if value is None:
-        return ""
-    try:
-        if value >= 1e9:
-            return f"{value/1e9:,.1f} bi".replace(",", "X").replace(".", ",").replace("X", ".")
-        elif value >= 1e6:
-            return f"{value/1e6:,.1f} mi".replace(",", "X").replace(".", ",").replace("X", ".")
-        elif value >= 1e3:
-            return f"{value/1e3:,.1f} mil".replace(",", "X").replace(".", ",").replace("X", ".")
-        else:
-            return f"{value:,.1f}".replace(",", "X").replace(".", ",").replace("X", ".")
-    except Exception:
-        return str(value)
-
-
-def format_decimal(value, decimals: int = 1) -> str:
-    try:
-        return f"{float(value):.{decimals}f}".replace(".", ",")
-    except Exception:
-        return ""
-
-
 def load_data():
     # EPI scores SH6
-    df_epi_sh6 = pl.read_parquet(APP_DIR / 'data' / 'epi_scores_sh6.parquet')
+    df_epi_sh6 = decode(pl.read_parquet(APP_DIR / 'data' / 'epi_scores_sh6.parquet'))
     df_epi_sh6 = df_epi_sh6.with_columns(pl.col("epi_score_normalized").round(3))
 
     # EPI scores countries
-    df_epi_countries = pl.read_parquet(APP_DIR / 'data' / 'epi_scores_countries.parquet')
+    df_epi_countries = decode(pl.read_parquet(APP_DIR / 'data' / 'epi_scores_countries.parquet'))
     df_epi_countries = df_epi_countries.with_columns(pl.col("epi_score_normalized").round(3))
 
     # EPI scores detalhado
-    df_epi = pl.read_parquet(APP_DIR / 'data' / 'epi_scores.parquet')
+    df_epi = decode(pl.read_parquet(APP_DIR / 'data' / 'epi_scores.parquet'))
     df_epi = df_epi.with_columns(pl.col("epi_score_normalized").round(3))
 
     # EPI por setores SC Competitiva
-    df_epi_sc_comp = pl.read_parquet(APP_DIR / 'data' / 'epi_scores_sc_comp.parquet')
+    df_epi_sc_comp = decode(pl.read_parquet(APP_DIR / 'data' / 'epi_scores_sc_comp.parquet'))
     df_epi_sc_comp = df_epi_sc_comp.with_columns(pl.col("epi_score_normalized").round(3))
 
     # Mercados mundiais (para tabela e info)
@@ -106,19 +86,19 @@ def load_data():
         (pl.col('sh6') + " - " + pl.col('product_description_br')).alias('sh6_product')
     )
     df_markets = df_markets.with_columns(
-        pl.col("value").map_elements(format_contabil).alias("value_contabil"),
-        pl.col("dist").map_elements(format_contabil).alias("dist"),
+        contabil("value").alias("value_contabil"),
+        contabil("dist").alias("dist"),
     )
 
     # Competidores (fornecedores)
-    df_competitors = pl.read_parquet(APP_DIR / 'data' / 'df_competitors.parquet')
+    df_competitors = decode(pl.read_parquet(APP_DIR / 'data' / 'df_competitors.parquet'))
 
     # Ajustes decimais em texto como no app
     df_markets = df_markets.with_columns(
-        pl.col("cagr_5y").map_elements(lambda x: format_decimal(x, 1)).alias("cagr_5y_adj"),
-        pl.col('market_share').map_elements(lambda x: format_decimal(x, 1)).alias('market_share'),
-        pl.col('share_sc').map_elements(lambda x: format_decimal(x, 1)).alias('share_sc'),
-        pl.col('share_brazil').map_elements(lambda x: format_decimal(x, 1)).alias('share_brazil'),
+        decimal("cagr_5y", 1).alias("cagr_5y_adj"),
+        decimal('market_share', 1).alias('market_share'),
+        decimal('share_sc', 1).alias('share_sc'),
+        decimal('share_brazil', 1).alias('share_brazil'),
     )
 
     return df_epi_sh6, df_epi_countries, df_epi, df_epi_sc_comp, df_markets, df_competitors
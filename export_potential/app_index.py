@@ -0,0 +1,76 @@
+"""App tables sorted by product, with the row range of every key.
+
+The app shows one product at a time (and, in the suppliers tab, one
+importer of it). :func:`indexed_tables` sorts a table by its keys, in the
+order the app displays the rows of a key, and pairs it with
+``<name>.offsets``, the first and past-the-last row of every key, to be
+published to the app store.
+:func:`read_indexed` loads both, and :meth:`IndexedFrame.rows` slices the
+rows of a key instead of filtering the whole table.
+"""
+
+from pathlib import Path
+from typing import NamedTuple
+
+import polars as pl
+
+from export_potential.app_store import app_store, current_version, read_table
+
+
+######## Writing ########
+def sort_by_keys(df: pl.DataFrame, keys: list, by: str, descending: bool = True) -> pl.DataFrame:
+    """``df`` with the rows of each key together, ordered by ``by`` within a key."""
+    return df.sort(
+        [*[pl.col(key).cast(pl.String) for key in keys], by],
+        descending=[False] * len(keys) + [descending],
+        nulls_last=True,
+        maintain_order=True
+    )
+
+
+def offsets(df: pl.DataFrame, keys: list) -> pl.DataFrame:
+    """First (start) and past-the-last (stop) row of every key of a :func:`sort_by_keys` frame."""
+    return (
+        df.select([pl.col(key).cast(pl.String) for key in keys])
+        .with_row_index('row')
+        .group_by(keys, maintain_order=True)
+        .agg([
+            pl.col('row').first().alias('start'),
+            (pl.col('row').last() + 1).alias('stop'),
+        ])
+    )
+
+
+def indexed_tables(df: pl.DataFrame, name: str, keys: list, by: str, descending: bool = True) -> dict:
+    """Tables ``name`` (``df`` sorted by ``keys`` and ``by``) and ``<name>.offsets``."""
+    df = sort_by_keys(df, keys, by, descending)
+    return {name: df, f'{name}.offsets': offsets(df, keys)}
+
+
+######## Reading ########
+class IndexedFrame(NamedTuple):
+    """A table sorted by its keys, its offsets table and a {key: (start, stop)} lookup."""
+    df: pl.DataFrame
+    index: pl.DataFrame
+    ranges: dict
+
+    def rows(self, *key) -> pl.DataFrame:
+        """Rows of ``key`` (one value per key column), empty when the key is absent."""
+        start, stop = self.ranges.get(key, (0, 0))
+        return self.df.slice(start, stop - start)
+
+
+def read_indexed(name: str, columns=None, store: Path = app_store, version: str = None) -> IndexedFrame:
+    """Table published from :func:`indexed_tables`, with only ``columns`` when given.
+
+    The table and its offsets come from the same ``version`` (default: the
+    current one), even if a publish lands between the two reads.
+    """
+    version = current_version(store) if version is None else version
+    index = read_table(f'{name}.offsets', store=store, version=version)
+    keys = index.columns[:-2]
+    ranges = {
+        tuple(row[:-2]): (row[-2], row[-1])
+        for row in index.iter_rows()
+    }
+    return IndexedFrame(read_table(name, columns, store, version), index.select(keys), ranges)
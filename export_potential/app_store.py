@@ -0,0 +1,179 @@
+"""Versioned store of the app tables, as memory-mapped Arrow IPC files.
+
+The stages write the app tables as Parquet; make_app_store publishes them to
+app/data/store/ as uncompressed Arrow IPC (Feather v2). The app opens them
+with :func:`read_table`: the file is memory-mapped, and the buffers of its
+fixed-width numeric columns are used as they are, so every session and
+Streamlit process on a host reads the same pages of the OS page cache.
+String, Enum and Categorical columns may be materialised in each process
+(see :func:`read_table`).
+
+Each :func:`publish` writes a new version directory with a manifest.json
+(SHA-256, rows, columns and size of every table) and then swaps the
+``current`` pointer file atomically, so readers see either the old or the
+new version, never a mix::
+
+    app/data/store/
+        current                          <- '20261017T013000-1a2b3c4d'
+        20261017T013000-1a2b3c4d/
+            manifest.json
+            epi_scores_sh6.arrow
+            ...
+
+Tables whose content did not change are hard links to the previous
+version's files, and a publish that changes nothing keeps the current
+version. The app keys its caches on the table hashes of the manifest, so it
+reloads a table right after a publish that changed it and never otherwise.
+"""
+
+from datetime import datetime
+from functools import lru_cache
+import hashlib
+import json
+import os
+from pathlib import Path
+import shutil
+
+import polars as pl
+import pyarrow as pa
+
+from export_potential.config import app_data
+
+app_store = app_data / 'store'
+
+CURRENT = 'current'
+MANIFEST = 'manifest.json'
+
+# Versions kept on disk, the current one included
+KEEP_VERSIONS = 3
+
+
+######## Manifest ########
+def current_version(store: Path = app_store) -> str:
+    """Version the ``current`` pointer of ``store`` refers to."""
+    pointer = store / CURRENT
+    if not pointer.exists():
+        raise FileNotFoundError(
+            f'No app data published in {store}, run python -m export_potential.make_app_store'
+        )
+    return pointer.read_text().strip()
+
+
+@lru_cache(maxsize=8)
+def _read_manifest(path: Path) -> dict:
+    # A version directory never changes once published, so its manifest is read once
+    with open(path) as f:
+        return json.load(f)
+
+
+def read_manifest(store: Path = app_store, version: str = None) -> dict:
+    """Manifest of ``version`` (default: the current one)."""
+    version = current_version(store) if version is None else version
+    return _read_manifest(store / version / MANIFEST)
+
+
+def table_hashes(*names, store: Path = app_store, version: str = None) -> tuple:
+    """SHA-256 of tables ``names`` in ``version`` (default: the current one), to key caches on."""
+    tables = read_manifest(store, version)['tables']
+    return tuple(tables[name]['sha256'] for name in names)
+
+
+def table_path(name: str, store: Path = app_store, version: str = None) -> Path:
+    manifest = read_manifest(store, version)
+    return store / manifest['version'] / manifest['tables'][name]['file']
+
+
+######## Reading ########
+def read_table(name: str, columns=None, store: Path = app_store, version: str = None) -> pl.DataFrame:
+    """Memory-mapped table ``name`` of the store, with only ``columns`` when given.
+
+    Only fixed-width numeric columns are guaranteed to be zero-copy views of
+    the mapped file. String, Enum and Categorical columns may be materialised
+    in each process that reads them. Enum and Categorical columns are always
+    re-encoded into polars' categories. A String column is a view only while
+    the file stores it as Arrow ``string_view`` (what polars writes); any
+    other string type is converted. Select only the columns you need
+    to keep that per-process memory small.
+    """
+    with pa.memory_map(str(table_path(name, store, version))) as source:
+        table = pa.ipc.open_file(source).read_all()
+    if columns is not None:
+        table = table.select(columns)
+    # Without rechunk the record batches stay as views of the mapped file
+    return pl.from_arrow(table, rechunk=False)
+
+
+######## Publishing ########
+def _digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _versions(store: Path) -> list:
+    return sorted(path.name for path in store.iterdir() if path.is_dir() and not path.name.startswith('.'))
+
+
+def publish(tables: dict, store: Path = app_store) -> str:
+    """Publish ``tables`` ({name: DataFrame}) as a new version of ``store`` and return it.
+
+    When every table matches the current version, nothing is written and the
+    current version is returned.
+    """
+    store.mkdir(parents=True, exist_ok=True)
+    try:
+        previous = read_manifest(store)
+    except FileNotFoundError:
+        previous = None
+
+    staging = store / f'.staging-{os.getpid()}'
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+
+    entries = {}
+    for name, df in tables.items():
+        path = staging / f'{name}.arrow'
+        df.write_ipc(path, compression='uncompressed')
+        entry = {
+            'file': path.name,
+            'sha256': _digest(path),
+            'rows': df.height,
+            'columns': df.columns,
+            'bytes': path.stat().st_size,
+        }
+
+        # An unchanged table shares the previous version's file (and its cached pages)
+        old = previous and previous['tables'].get(name)
+        if old and old['sha256'] == entry['sha256']:
+            path.unlink()
+            try:
+                os.link(store / previous['version'] / old['file'], path)
+            except OSError:
+                shutil.copy2(store / previous['version'] / old['file'], path)
+        entries[name] = entry
+
+    hashes = {name: entry['sha256'] for name, entry in entries.items()}
+    if previous and hashes == {name: entry['sha256'] for name, entry in previous['tables'].items()}:
+        shutil.rmtree(staging)
+        return previous['version']
+
+    digest = hashlib.sha256(json.dumps(hashes, sort_keys=True).encode()).hexdigest()
+    version = f"{datetime.now():%Y%m%dT%H%M%S}-{digest[:8]}"
+    manifest = {'version': version, 'created': datetime.now().isoformat(timespec='seconds'), 'tables': entries}
+    with open(staging / MANIFEST, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    staging.rename(store / version)
+
+    # The pointer is replaced in one rename, so a reader sees the old or the new version
+    tmp = store / f'{CURRENT}.{os.getpid()}.tmp'
+    tmp.write_text(version)
+    tmp.replace(store / CURRENT)
+
+    # Old versions go; processes that still map their files keep reading them
+    for old_version in _versions(store)[:-KEEP_VERSIONS]:
+        if old_version != version:
+            shutil.rmtree(store / old_version, ignore_errors=True)
+
+    return version
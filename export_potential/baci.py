@@ -0,0 +1,261 @@
+"""Lazy ingestion of the BACI bilateral trade dump.
+
+The raw CSV files in data/raw are converted once into a hive-partitioned
+Parquet dataset (data/interim/baci/year=YYYY/) by :func:`convert_baci`, which
+only the 'baci' stage (make_baci) runs. Only files whose size or modification
+time changed since the last run are reconverted.
+
+Every stage that needs bilateral trade flows starts from :func:`scan_baci`,
+which returns a ``pl.LazyFrame`` over that dataset already mapped to ISO3
+country codes and product descriptions. Nothing is read until the caller
+collects, so each stage only decodes the columns and years it uses. Reading
+never writes to the dataset, so stages that run at the same time can share it.
+
+Stages that aggregate the full history go through :func:`collect_baci`,
+which in streaming mode (see :mod:`export_potential.config`) splits the
+years into batches that fit the memory ceiling and runs each batch on the
+polars streaming engine.
+"""
+
+import json
+import shutil
+
+import polars as pl
+
+from export_potential.codes import country
+from export_potential.config import (
+    data_interim,
+    data_raw,
+    memory_limit_gb,
+    references,
+    streaming,
+)
+
+baci_dataset = data_interim / 'baci'
+baci_sources = data_interim / 'baci_sources.json'
+
+# Raw BACI columns and the names used throughout the pipeline
+BACI_COLUMNS = {'t': 'year', 'i': 'exporter', 'j': 'importer',
+                'k': 'sh6', 'v': 'value', 'q': 'quantity'}
+
+# Rough ratio between the in-memory size of BACI rows and their zstd Parquet size
+PARQUET_EXPANSION = 8
+
+# Quantities are missing for some flows and come as padded 'NA' strings,
+# so they are read as text and parsed after the scan
+BACI_SCHEMA = {
+    't': pl.Int16,
+    'i': pl.Int16,
+    'j': pl.Int16,
+    'k': pl.Int32,
+    'v': pl.Float64,
+    'q': pl.String,
+}
+
+
+######## Parquet conversion ########
+def _load_sources() -> dict:
+    if baci_sources.exists():
+        return json.loads(baci_sources.read_text())
+    return {}
+
+
+def _save_sources(sources: dict) -> None:
+    tmp = baci_sources.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(sources, indent=2))
+    tmp.replace(baci_sources)
+
+
+def _remove_outputs(entry: dict) -> None:
+    for year in entry['years']:
+        (baci_dataset / f'year={year}' / entry['output']).unlink(missing_ok=True)
+
+
+def convert_baci(files=None) -> list:
+    """Write new or changed raw CSVs into the year-partitioned Parquet dataset.
+
+    Returns the list of converted source files.
+    """
+    if files is None:
+        files = sorted(data_raw.glob('*.csv'))
+
+    sources = _load_sources()
+    converted = []
+
+    # Dropping outputs of source files that no longer exist
+    current = {f.name for f in files}
+    for name in [name for name in sources if name not in current]:
+        _remove_outputs(sources.pop(name))
+
+    for f in files:
+        stat = f.stat()
+        entry = sources.get(f.name)
+        if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+            continue
+
+        if entry:
+            _remove_outputs(entry)
+
+        df = (
+            pl.scan_csv(f, schema=BACI_SCHEMA)
+            .rename(BACI_COLUMNS)
+            .with_columns(
+                pl.col('quantity').str.strip_chars().cast(pl.Float64, strict=False)
+            )
+            .collect()
+        )
+
+        output = f.with_suffix('.parquet').name
+        years = sorted(df['year'].unique().to_list())
+        for year, df_year in df.partition_by('year', as_dict=True, include_key=False).items():
+            partition = baci_dataset / f'year={year[0]}'
+            partition.mkdir(parents=True, exist_ok=True)
+            df_year.write_parquet(partition / output, compression='zstd')
+
+        sources[f.name] = {
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'output': output,
+            'years': years,
+        }
+        _save_sources(sources)
+        converted.append(f)
+
+    _save_sources(sources)
+
+    # Removing partitions left empty by reconverted or deleted files
+    if baci_dataset.exists():
+        for partition in baci_dataset.iterdir():
+            if partition.is_dir() and not any(partition.iterdir()):
+                shutil.rmtree(partition)
+
+    return converted
+
+
+def _check_dataset() -> None:
+    # Conversion belongs to the baci stage; reading never writes the dataset
+    if not baci_dataset.exists():
+        raise FileNotFoundError(f'No BACI dataset in {baci_dataset}, run the baci stage')
+
+
+def baci_years() -> list:
+    """Years available in the Parquet dataset, in ascending order."""
+    _check_dataset()
+    return sorted(
+        int(p.name.split('=')[1]) for p in baci_dataset.glob('year=*') if p.is_dir()
+    )
+
+
+######## Lazy scans ########
+def scan_countries() -> pl.LazyFrame:
+    """BACI numeric country codes mapped to ISO3."""
+    return pl.scan_csv(
+        references / 'countries.csv',
+        schema_overrides={'country_code': pl.Int16}
+    ).select(['country_code', country('country_iso3')])
+
+
+def scan_products() -> pl.LazyFrame:
+    """HS6 product codes with their English descriptions."""
+    return pl.scan_csv(
+        references / 'products.csv',
+        schema_overrides={'code': pl.Int32}
+    ).select(['code', 'description'])
+
+
+def scan_baci(years=None) -> pl.LazyFrame:
+    """Lazy view of the BACI dataset with country and product mappings.
+
+    ``years`` restricts the scan to those partitions, so the other years are
+    never read. Columns: year, exporter, importer, sh6, product_description,
+    value (in US$, BACI reports thousands) and quantity, with the country and
+    product dtypes of :mod:`export_potential.codes`.
+    """
+    _check_dataset()
+
+    df_all = pl.scan_parquet(
+        baci_dataset,
+        hive_partitioning=True,
+        hive_schema={'year': pl.Int16}
+    )
+
+    if years is not None:
+        df_all = df_all.filter(pl.col('year').is_in(list(years)))
+
+    df_countries = scan_countries()
+
+    return (
+        df_all
+        .join(
+            df_countries.rename({'country_iso3': 'exporter_iso3'}),
+            left_on='exporter',
+            right_on='country_code',
+            how='left'
+        )
+        .join(
+            df_countries.rename({'country_iso3': 'importer_iso3'}),
+            left_on='importer',
+            right_on='country_code',
+            how='left'
+        )
+        .join(
+            scan_products(),
+            left_on='sh6',
+            right_on='code',
+            how='left'
+        )
+        .select([
+            pl.col('year').cast(pl.Int64),
+            pl.col('exporter_iso3').alias('exporter'),
+            pl.col('importer_iso3').alias('importer'),
+            'sh6',
+            pl.col('description').alias('product_description'),
+            (pl.col('value') * 1000).alias('value'),
+            'quantity'
+        ])
+    )
+
+
+######## Batched collection ########
+def year_batches(memory_gb: float = memory_limit_gb) -> list:
+    """Consecutive years grouped so each batch's decoded size fits ``memory_gb``."""
+    budget = memory_gb * 1024 ** 3
+    batches, batch, batch_size = [], [], 0
+    for year in baci_years():
+        size = sum(f.stat().st_size for f in (baci_dataset / f'year={year}').glob('*.parquet'))
+        size *= PARQUET_EXPANSION
+        if batch and batch_size + size > budget:
+            batches.append(batch)
+            batch, batch_size = [], 0
+        batch.append(year)
+        batch_size += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def collect_baci(build, years=None) -> list:
+    """Collect the plans ``build(scan_baci(...))`` returns, one DataFrame per plan.
+
+    ``build`` receives the lazy BACI scan and returns a list of LazyFrames.
+    In memory all years are collected at once. In streaming mode each batch
+    of years from :func:`year_batches` is collected with the streaming
+    engine and the batches are concatenated, so ``build`` must keep 'year'
+    in its group keys. Callers sort the results to get the same row order
+    in both modes.
+    """
+    if years is None:
+        years = baci_years()
+
+    if not streaming:
+        return pl.collect_all(build(scan_baci(years)))
+
+    batches = [
+        [year for year in batch if year in years]
+        for batch in year_batches()
+    ]
+    results = [
+        pl.collect_all(build(scan_baci(batch)), engine='streaming')
+        for batch in batches if batch
+    ]
+    return [pl.concat(frames) for frames in zip(*results)]
@@ -0,0 +1,281 @@
+"""Supply, ease of trade and EPI for many exporting units in one pass.
+
+make_supply, make_ease and model_epi compute the EPI of a single unit: Santa
+Catarina, as the share_sc.xlsx fraction of Brazil's exports. The functions
+here compute the same quantities for any number of units at once, with the
+unit as one more join key instead of one script run per unit:
+
+- states: each ``references/share_<uf>.xlsx`` workbook (sh6 and one share
+  column per year, like share_sc.xlsx) applied to Brazil's exports, see
+  :func:`unit_shares`;
+- countries: every exporter as its own unit with a share of 1 (pass
+  ``shares=None``).
+
+Unit 'SC' reproduces supply_potential_sc, ease_of_trade and the epi_score
+of epi_scores.parquet, up to the rounding of the sums.
+"""
+
+import polars as pl
+
+from export_potential.codes import SH6, country
+from export_potential.config import references
+from export_potential.macro import ACC_GROWTH_GDP, cumulative_index, gdp_growth
+from export_potential.reference_data import read_reference
+from export_potential.weighting import weighted_average
+
+# Exporter the unit shares are taken from
+PARENT = 'BRA'
+
+UNIT_KEYS = ['unit', 'exporter']
+
+
+######## Units ########
+def unit_shares(units=None) -> pl.DataFrame:
+    """Long table (unit, sh6, year, share) from the ``references/share_<unit>.xlsx`` workbooks.
+
+    ``units`` defaults to every workbook found; unit names are upper case
+    ('SC' for share_sc.xlsx).
+    """
+    if units is None:
+        units = sorted(path.stem.removeprefix('share_') for path in references.glob('share_*.xlsx'))
+
+    frames = []
+    for unit in units:
+        df_share = read_reference(f'share_{unit.lower()}')
+        frames.append(
+            df_share
+            .with_columns(pl.col('sh6').cast(SH6))
+            .unpivot(index=['sh6'], variable_name='year', value_name='share')
+            .select([
+                pl.lit(unit.upper()).alias('unit'),
+                'sh6',
+                pl.col('year').cast(pl.Int64),
+                pl.col('share').cast(pl.Float64)
+            ])
+        )
+    return pl.concat(frames)
+
+
+def _by_unit(df: pl.DataFrame, shares, parent: str) -> pl.DataFrame:
+    """``df`` with a row per unit and 'value_unit', the unit's part of 'value'.
+
+    Each parent row is broadcast to every unit before joining the shares, so
+    a product or year missing from a unit's table gets a null share, as in
+    the single-unit scripts.
+    """
+    if shares is None:
+        df = df.with_columns([
+            pl.col('exporter').cast(pl.String).alias('unit'),
+            pl.lit(1.0).alias('share')
+        ])
+    else:
+        df = (
+            df.filter(pl.col('exporter') == parent)
+            .join(shares.select(pl.col('unit').unique(maintain_order=True)), how='cross')
+            .join(shares, on=['unit', 'sh6', 'year'], how='left')
+        )
+    return df.with_columns((pl.col('value') * pl.col('share')).alias('value_unit'))
+
+
+def gdp_index(df_gdp_growth: pl.DataFrame, horizon: int = 2027) -> pl.DataFrame:
+    """Accumulated GDP growth from 2022 to ``horizon`` by country (ISO, gdp_index).
+
+    Countries without a projection for a year get the mean growth of that year.
+    """
+    return (
+        cumulative_index(gdp_growth(df_gdp_growth), 'gdp_growth', 'gdp_index', horizons=[horizon])
+        .select([country('ISO'), 'gdp_index'])
+    )
+
+
+def _keys(df: pl.DataFrame, *exclude) -> list:
+    # Key columns a frame carries beyond the ones every frame has (e.g. 'scenario')
+    return [col for col in df.columns if col not in exclude]
+
+
+######## Supply ########
+def unit_exports(df_exports: pl.DataFrame, shares, parent: str = PARENT) -> pl.DataFrame:
+    """Weighted exports of each unit by sh6 in the last year, next to its exporter's own.
+
+    ``df_exports`` is comex_exps_weighted (year, exporter, sh6,
+    product_description, value, weighted_exports).
+    """
+    base_year = df_exports['year'].max()
+
+    df_units = _by_unit(
+        df_exports.select(['year', 'exporter', 'sh6', 'value']), shares, parent
+    )
+
+    weighted_exports = weighted_average(
+        df_units,
+        by=[*UNIT_KEYS, 'sh6'],
+        value='value_unit',
+        alias='weighted_exports_unit',
+        base_years=[base_year]
+    ).drop('base_year').collect()
+
+    return (
+        df_units.filter(pl.col('year') == base_year)
+        .select([*UNIT_KEYS, 'sh6'])
+        .join(weighted_exports, on=[*UNIT_KEYS, 'sh6'], how='left')
+        .join(
+            df_exports.filter(pl.col('year') == base_year)
+            .select(['exporter', 'sh6', 'product_description', 'weighted_exports']),
+            on=['exporter', 'sh6'],
+            how='left'
+        )
+    )
+
+
+def world_exports(df_exports: pl.DataFrame, df_gdp_index: pl.DataFrame) -> pl.DataFrame:
+    """Projected exports of every exporter, from its own GDP index, summed by sh6.
+
+    Columns of ``df_gdp_index`` other than ISO and gdp_index (a scenario, say)
+    are kept as keys, giving one world projection per key.
+    """
+    keys = _keys(df_gdp_index, 'ISO', 'gdp_index')
+    return (
+        df_exports.filter(pl.col('year') == df_exports['year'].max())
+        .join(df_gdp_index, left_on='exporter', right_on='ISO', how='left')
+        .group_by([*keys, 'sh6'])
+        .agg((pl.col('weighted_exports') * pl.col('gdp_index')).sum().alias('world_proj_exports'))
+    )
+
+
+def project_supply(df_units: pl.DataFrame, df_world: pl.DataFrame, by=('unit',)) -> pl.DataFrame:
+    """Projected exports of each unit ('weighted_exports_unit' times 'growth') and their share of the world's.
+
+    ``by`` are the keys of a unit (plus e.g. 'scenario'); the keys shared
+    with ``df_world`` are joined on.
+    """
+    by = list(by)
+    return (
+        df_units
+        .join(df_world, on=[*_keys(df_world, 'world_proj_exports')], how='left')
+        .with_columns((pl.col('weighted_exports_unit') * pl.col('growth')).alias('proj_exports_unit'))
+        .with_columns((pl.col('proj_exports_unit') / pl.col('world_proj_exports')).alias('unit_share_proj'))
+        .filter(pl.col('unit_share_proj').is_not_null())
+        .select([*by, 'exporter', 'sh6', 'product_description', 'weighted_exports',
+                 'proj_exports_unit', 'unit_share_proj'])
+        .sort([*by, 'unit_share_proj'], descending=[False] * len(by) + [True], maintain_order=True)
+    )
+
+
+def supply(df_exports: pl.DataFrame, shares, df_gdp_index: pl.DataFrame,
+           parent: str = PARENT, growth=ACC_GROWTH_GDP) -> pl.DataFrame:
+    """Projected exports of each unit and their share of the world's projection by sh6.
+
+    ``growth`` is the accumulated growth of the units; with ``None`` each
+    exporter's GDP index is used (the countries mode).
+    """
+    df_units = unit_exports(df_exports, shares, parent)
+    if growth is not None:
+        df_units = df_units.with_columns(pl.lit(growth).alias('growth'))
+    else:
+        df_units = df_units.join(
+            df_gdp_index.select([pl.col('ISO').alias('exporter'), pl.col('gdp_index').alias('growth')]),
+            on='exporter',
+            how='left'
+        )
+    return project_supply(df_units, world_exports(df_exports, df_gdp_index))
+
+
+######## Bilateral exports and ease of trade ########
+def bilateral_exports(df_flows: pl.DataFrame, shares, parent: str = PARENT) -> pl.DataFrame:
+    """Weighted exports of each unit by importer and sh6 in the last year.
+
+    ``df_flows`` holds the BACI flows (year, exporter, importer, sh6, value)
+    of the years entering the weighted average.
+    """
+    base_year = df_flows['year'].max()
+
+    df_units = _by_unit(
+        df_flows.select(['year', 'exporter', 'importer', 'sh6', 'value']), shares, parent
+    )
+
+    weighted_exports = weighted_average(
+        df_units,
+        by=[*UNIT_KEYS, 'importer', 'sh6'],
+        value='value_unit',
+        alias='weighted_exports_unit',
+        base_years=[base_year]
+    ).drop('base_year').collect()
+
+    return (
+        df_units.filter(pl.col('year') == base_year)
+        .select([*UNIT_KEYS, 'importer', 'sh6'])
+        .join(weighted_exports, on=[*UNIT_KEYS, 'importer', 'sh6'], how='left')
+        .group_by([*UNIT_KEYS, 'importer', 'sh6'])
+        .agg(pl.sum('weighted_exports_unit').alias('bilateral_exports_unit_sh6'))
+        .sort([*UNIT_KEYS, 'importer', 'sh6'])
+    )
+
+
+def ease_of_trade(df_bilateral_sh6: pl.DataFrame, df_demand: pl.DataFrame,
+                  df_supply: pl.DataFrame, by=('unit',)) -> pl.DataFrame:
+    """Exports of each unit to an importer over its imports of the unit's products, weighted by supply share."""
+    by = list(by)
+    df_bilateral = (
+        df_bilateral_sh6.group_by([*UNIT_KEYS, 'importer'])
+        .agg(pl.sum('bilateral_exports_unit_sh6').alias('bilateral_exports_unit'))
+    )
+
+    df_sum = (
+        df_demand.select(['importer', 'sh6', 'weighted_imports'])
+        .join(df_supply.select([*by, 'sh6', 'unit_share_proj']), on='sh6', how='inner')
+        .group_by([*by, 'importer'])
+        .agg((pl.col('weighted_imports') * pl.col('unit_share_proj')).sum().alias('sum_value_unit'))
+    )
+
+    return (
+        df_sum.join(df_bilateral, on=['unit', 'importer'], how='left')
+        .with_columns((pl.col('bilateral_exports_unit') / pl.col('sum_value_unit')).alias('ease_of_trade'))
+        .select([*by, 'exporter', 'importer', 'ease_of_trade'])
+        .sort([*by, 'importer'])
+    )
+
+
+######## EPI ########
+def epi_scores(df_supply: pl.DataFrame, df_demand: pl.DataFrame, df_ease: pl.DataFrame,
+               df_bilateral_sh6: pl.DataFrame, by=('unit',)) -> pl.DataFrame:
+    """EPI of every unit, importer and sh6, normalised between 0 and 1 within each unit and sh6.
+
+    ``df_demand`` may carry keys of ``by`` too (a projection per scenario).
+    """
+    by = list(by)
+    demand_keys = [col for col in by if col in df_demand.columns]
+    df_epi = (
+        df_supply
+        .join(
+            df_demand.select([*demand_keys, 'importer', 'sh6', 'projected_import_value']),
+            on=[*demand_keys, 'sh6'],
+            how='left'
+        )
+        .join(df_ease.select([*by, 'importer', 'ease_of_trade']), on=[*by, 'importer'], how='left')
+        .join(df_bilateral_sh6, on=[*UNIT_KEYS, 'importer', 'sh6'], how='left')
+        .with_columns(
+            (pl.col('unit_share_proj') * pl.col('projected_import_value') * pl.col('ease_of_trade'))
+            .alias('epi_score')
+        )
+        .filter(pl.col('epi_score').is_not_nan())
+        .with_columns([
+            pl.col('epi_score').fill_null(0),
+            pl.col('proj_exports_unit').fill_null(0),
+            pl.col('bilateral_exports_unit_sh6').fill_null(0),
+        ])
+    )
+
+    epi_min = pl.col('epi_score').min().over([*by, 'sh6'])
+    epi_max = pl.col('epi_score').max().over([*by, 'sh6'])
+    return (
+        df_epi
+        .with_columns(
+            pl.when(epi_max != epi_min)
+            .then((pl.col('epi_score') - epi_min) / (epi_max - epi_min))
+            .otherwise(0.0)
+            .alias('epi_score_normalized')
+        )
+        .select([*by, 'exporter', 'importer', 'sh6', 'bilateral_exports_unit_sh6', 'proj_exports_unit',
+                 'projected_import_value', 'epi_score', 'epi_score_normalized'])
+        .sort([*by, 'epi_score'], descending=[False] * len(by) + [True], maintain_order=True)
+    )
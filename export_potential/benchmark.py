@@ -0,0 +1,146 @@
+"""Scaling benchmark of the pipeline on synthetic BACI data.
+
+For every scale, :func:`run_benchmark` builds a workspace with a copy of the
+package and of references/, fills its data/raw with
+:func:`export_potential.synthetic.generate_baci` and runs the data stages
+(:data:`BENCHMARK_STAGES` and their upstream) there. Paths in
+:mod:`export_potential.config` follow the package location, so the real data
+is never touched. The per-stage run reports of every scale are gathered into
+reports/benchmark/<run_id>.csv with the throughput of each stage. A stage
+that fails is kept in the report with its status, and the stages after it are
+marked 'blocked'.
+
+Workspaces are kept between runs and the data is only regenerated when the
+scale or the seed changes.
+
+Usage::
+
+    python -m export_potential.benchmark 1M 10M 100M --jobs 2
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+import polars as pl
+import typer
+
+from export_potential.config import data_interim, references, reports
+from export_potential.synthetic import generate_baci, parse_scale
+
+package = Path(__file__).resolve().parent
+benchmark_workspaces = data_interim / 'benchmark'
+benchmark_reports = reports / 'benchmark'
+
+# Stages run at each scale, with their upstream; the app stages read tables
+# that synthetic BACI data cannot produce
+BENCHMARK_STAGES = ['model_epi', 'analysis_epi', 'monte_carlo']
+
+
+def prepare_workspace(scale: str, seed: int = 0, root: Path = benchmark_workspaces) -> Path:
+    """Workspace with the current code, the references and synthetic BACI data at ``scale``."""
+    workspace = root / scale
+    for directory in ['data/raw', 'data/interim', 'data/processed', 'app/data']:
+        (workspace / directory).mkdir(parents=True, exist_ok=True)
+
+    # The code is always refreshed, so the benchmark measures the working tree
+    shutil.rmtree(workspace / 'export_potential', ignore_errors=True)
+    shutil.copytree(package, workspace / 'export_potential',
+                    ignore=shutil.ignore_patterns('__pycache__'))
+    shutil.copytree(references, workspace / 'references', dirs_exist_ok=True)
+
+    marker = workspace / 'data' / 'raw' / 'synthetic.json'
+    spec = {'rows': parse_scale(scale), 'seed': seed}
+    if not marker.exists() or json.loads(marker.read_text()) != spec:
+        for f in (workspace / 'data' / 'raw').glob('*.csv'):
+            f.unlink()
+        generate_baci(spec['rows'], workspace / 'data' / 'raw', seed=seed)
+        marker.write_text(json.dumps(spec))
+
+    return workspace
+
+
+def run_workspace(workspace: Path, jobs: int = 2, stages=BENCHMARK_STAGES) -> pl.DataFrame:
+    """Run ``stages`` and their upstream in ``workspace`` and return the run report.
+
+    The report of a run with failed stages is returned as well, with their
+    'status'.
+    """
+    env = {**os.environ, 'PYTHONPATH': str(workspace)}
+    started = time.time()
+    result = subprocess.run(
+        [sys.executable, '-m', 'export_potential.pipeline', 'run', *stages,
+         '--force', '--jobs', str(jobs)],
+        cwd=workspace, env=env
+    )
+
+    reports_dir = workspace / 'reports' / 'pipeline'
+    new_reports = [path for path in reports_dir.glob('*.json') if path.stat().st_mtime >= started]
+    if not new_reports:
+        raise RuntimeError(f'The pipeline in {workspace} exited with code {result.returncode} '
+                           'without writing a run report')
+    if result.returncode != 0:
+        print(f'Pipeline in {workspace} exited with code {result.returncode}, '
+              'failed stages are marked in the report')
+    return pl.DataFrame(json.loads(max(new_reports).read_text()))
+
+
+def run_benchmark(scales, jobs: int = 2, seed: int = 0) -> pl.DataFrame:
+    """Benchmark every stage at each of ``scales`` and write the results to reports/benchmark/."""
+    results = []
+    for scale in scales:
+        workspace = prepare_workspace(scale, seed)
+        raw_rows = sum(
+            pl.scan_csv(f).select(pl.len()).collect().item()
+            for f in (workspace / 'data' / 'raw').glob('*.csv')
+        )
+        report = run_workspace(workspace, jobs)
+        results.append(
+            report
+            .with_columns([
+                pl.lit(scale).alias('scale'),
+                pl.lit(raw_rows, dtype=pl.Int64).alias('raw_rows'),
+                # make_baci reads CSV, whose rows are not counted in the run report
+                pl.when(pl.col('stage') == 'baci')
+                .then(pl.lit(raw_rows))
+                .otherwise(pl.col('rows_in'))
+                .alias('rows_in'),
+            ])
+        )
+
+    df = (
+        pl.concat(results, how='diagonal_relaxed')
+        .with_columns([
+            (pl.col('rows_in') / pl.col('wall_s')).round(0).alias('rows_per_s'),
+            (pl.col('cpu_user_s') + pl.col('cpu_system_s')).round(3).alias('cpu_s'),
+        ])
+        .select([
+            'scale', 'raw_rows', 'stage', 'status', 'wall_s', 'cpu_s', 'peak_rss_mb',
+            'rows_in', 'rows_out', 'rows_per_s', 'output_bytes'
+        ])
+    )
+
+    benchmark_reports.mkdir(parents=True, exist_ok=True)
+    df.write_csv(benchmark_reports / f'{time.strftime("%Y%m%dT%H%M%S")}.csv')
+    return df
+
+
+def main(
+    scales: List[str] = typer.Argument(..., help='Scales to run, e.g. 1M 10M 100M.'),
+    jobs: int = typer.Option(2, help='Stages run concurrently.'),
+    seed: int = typer.Option(0, help='Random seed of the synthetic data.'),
+):
+    """Run the pipeline on synthetic data at each scale and report throughput and memory."""
+    df = run_benchmark(scales, jobs=jobs, seed=seed)
+    with pl.Config(tbl_rows=-1, tbl_cols=-1, tbl_width_chars=200,
+                   tbl_hide_dataframe_shape=True):
+        print(df)
+
+
+if __name__ == '__main__':
+    typer.run(main)
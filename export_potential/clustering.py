@@ -0,0 +1,185 @@
+"""Data-driven score categories: 1-D KMeans or Jenks natural breaks per group.
+
+:func:`assign_clusters` fits ``k`` classes to the scores of every group (each
+sh6, or a whole aggregate) and numbers each row from 0 (lowest class) to
+``k - 1``. A fit reduces to ``k - 1`` breaks, so assigning rows is a join and
+a few comparisons.
+
+Fits are cached in data/interim/clusters/ under a hash of the group's sorted
+scores, so reruns only fit the groups whose scores changed. The missing fits
+are split into batches that run across a pool of fresh worker processes.
+"""
+
+import hashlib
+import os
+
+from joblib import Parallel, delayed
+import numpy as np
+import polars as pl
+from sklearn.cluster import KMeans
+from threadpoolctl import threadpool_limits
+
+from export_potential.config import data_interim
+
+cluster_cache = data_interim / 'clusters'
+
+CLUSTER_METHODS = ['kmeans', 'jenks']
+
+# Groups fitted per task sent to the pool
+BATCH_SIZE = 64
+
+
+######## Fits ########
+def kmeans_breaks(values: np.ndarray, k: int) -> list:
+    """Breaks between the sorted centres of a 1-D KMeans (midpoints between centres)."""
+    n_clusters = min(k, len(np.unique(values)))
+    if n_clusters < 2:
+        return []
+    model = KMeans(n_clusters=n_clusters, n_init=10, random_state=0)
+    centres = np.sort(model.fit(values.reshape(-1, 1)).cluster_centers_.ravel())
+    return ((centres[:-1] + centres[1:]) / 2).tolist()
+
+
+def jenks_breaks(values: np.ndarray, k: int) -> list:
+    """Jenks natural breaks (Fisher's exact optimal 1-D partition).
+
+    Returns the lowest value of every class but the first, so a value belongs
+    to class ``i`` when it is at least the ``i``-th break.
+    """
+    values = np.sort(values)
+    n = len(values)
+    n_classes = min(k, len(np.unique(values)))
+    if n_classes < 2:
+        return []
+
+    # Sum of squared deviations of values[i:j] from prefix sums, for every i < j
+    s1 = np.concatenate([[0.0], np.cumsum(values)])
+    s2 = np.concatenate([[0.0], np.cumsum(values ** 2)])
+
+    def sse(starts, end):
+        count = end - starts
+        total = s1[end] - s1[starts]
+        return (s2[end] - s2[starts]) - total ** 2 / count
+
+    # cost[m, j]: best cost of splitting values[:j] into m + 1 classes
+    cost = np.full((n_classes, n + 1), np.inf)
+    start = np.zeros((n_classes, n + 1), dtype=np.int64)
+    cost[0, 1:] = [sse(np.array([0]), j)[0] for j in range(1, n + 1)]
+    for m in range(1, n_classes):
+        for j in range(m + 1, n + 1):
+            starts = np.arange(m, j)
+            candidates = cost[m - 1, starts] + sse(starts, j)
+            best = np.argmin(candidates)
+            cost[m, j] = candidates[best]
+            start[m, j] = starts[best]
+
+    breaks, end = [], n
+    for m in range(n_classes - 1, 0, -1):
+        end = start[m, end]
+        breaks.append(values[end])
+    return sorted(breaks)
+
+
+def _fit_batch(batch: list, method: str, k: int) -> list:
+    fit = kmeans_breaks if method == 'kmeans' else jenks_breaks
+
+    # One thread per fit: the parallelism comes from the pool
+    with threadpool_limits(1):
+        return [fit(values, k) for values in batch]
+
+
+def _digest(values: np.ndarray, method: str, k: int) -> str:
+    digest = hashlib.sha256(f'{method}:{k}:'.encode())
+    digest.update(np.sort(values).astype(np.float64).tobytes())
+    return digest.hexdigest()
+
+
+def fit_breaks(groups: list, method: str = 'kmeans', k: int = 5, jobs=None) -> list:
+    """Breaks of each array of scores in ``groups``, from the cache when possible."""
+    if method not in CLUSTER_METHODS:
+        raise ValueError(f"Unknown clustering method '{method}', use one of {CLUSTER_METHODS}")
+
+    cache_file = cluster_cache / f'{method}_k{k}.parquet'
+    cached = {}
+    if cache_file.exists():
+        df_cache = pl.read_parquet(cache_file)
+        cached = dict(zip(df_cache['digest'].to_list(), df_cache['breaks'].to_list()))
+
+    digests = [_digest(values, method, k) for values in groups]
+    missing = {}
+    for digest, values in zip(digests, groups):
+        if digest not in cached:
+            missing.setdefault(digest, values)
+
+    if missing:
+        batches = [
+            list(missing.values())[i:i + BATCH_SIZE]
+            for i in range(0, len(missing), BATCH_SIZE)
+        ]
+        jobs = jobs or os.cpu_count() or 1
+        if jobs > 1 and len(batches) > 1:
+            # Forking after polars, OpenMP or OpenBLAS started their threads is not
+            # safe, and spawn would re-run the stage script (it has no __main__
+            # guard). loky starts fresh interpreters that only import this module.
+            results = Parallel(min(jobs, len(batches)), backend='loky')(
+                delayed(_fit_batch)(batch, method, k) for batch in batches
+            )
+        else:
+            results = [_fit_batch(batch, method, k) for batch in batches]
+
+        fitted = [breaks for result in results for breaks in result]
+        cached.update(zip(missing, fitted))
+
+        cluster_cache.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(f'.{os.getpid()}.tmp')
+        pl.DataFrame(
+            {'digest': list(cached), 'breaks': list(cached.values())},
+            schema={'digest': pl.String, 'breaks': pl.List(pl.Float64)}
+        ).write_parquet(tmp)
+        tmp.replace(cache_file)
+
+    return [cached[digest] for digest in digests]
+
+
+######## Assignment ########
+def assign_clusters(df: pl.DataFrame, score: str, by=(), method: str = 'kmeans',
+                    k: int = 5, jobs=None) -> pl.DataFrame:
+    """Add 'cluster' (Int8, 0 to k - 1) from classes fitted to ``score`` within each ``by`` group.
+
+    With no ``by`` the whole frame is one group. Rows with a null or NaN
+    score get -1.
+    """
+    by = list(by)
+    key = by or [pl.lit(0).alias('_group')]
+    groups = (
+        df.group_by(key, maintain_order=True)
+        .agg(pl.col(score).drop_nulls().drop_nans().alias('_scores'))
+    )
+    breaks = fit_breaks(
+        [np.asarray(values, dtype=np.float64) for values in groups['_scores'].to_list()],
+        method=method, k=k, jobs=jobs
+    )
+
+    # Breaks padded with +inf, so groups fitted with fewer classes never reach the upper ones
+    break_columns = [f'_break_{i}' for i in range(k - 1)]
+    padded = [b + [float('inf')] * (k - 1 - len(b)) for b in breaks]
+    df_breaks = groups.drop('_scores').with_columns([
+        pl.Series(name, [b[i] for b in padded], dtype=pl.Float64)
+        for i, name in enumerate(break_columns)
+    ])
+
+    value = pl.col(score)
+    if by:
+        df = df.join(df_breaks, on=by, how='left', maintain_order='left')
+    else:
+        df = df.join(df_breaks.drop('_group'), how='cross', maintain_order='left')
+    return (
+        df.with_columns(
+            pl.when(value.is_null() | value.is_nan())
+            .then(pl.lit(-1))
+            .otherwise(pl.sum_horizontal([value >= pl.col(name) for name in break_columns]))
+            .cast(pl.Int8)
+            .alias('cluster')
+        )
+        .drop(break_columns)
+    )
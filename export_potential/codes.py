@@ -0,0 +1,88 @@
+"""Shared registry of country and product codes.
+
+Every artifact of the pipeline stores the same compact dtypes:
+
+- exporter and importer as a ``pl.Enum`` over the ISO3 codes in
+  countries.csv and countries_br.csv, so country joins compare integers;
+- sh6 as Int32 (zero-padded labels are built with :func:`sh6_label`);
+- names and descriptions repeated on every row as ``pl.Categorical``.
+
+:func:`decode` turns them back into text for display.
+"""
+
+from functools import lru_cache
+
+import polars as pl
+
+from export_potential.config import references
+
+COUNTRY_COLUMNS = ['exporter', 'importer']
+LABEL_COLUMNS = [
+    'exporter_name',
+    'importer_name',
+    'product_description',
+    'product_description_br',
+    'sh6_product',
+    'sc_comp',
+    'color',
+]
+SH6 = pl.Int32
+
+
+@lru_cache(maxsize=None)
+def country_enum() -> pl.Enum:
+    """Enum of every ISO3 code known to the reference tables."""
+    iso_baci = pl.read_csv(references / 'countries.csv')['country_iso3']
+    iso_br = pl.read_csv(
+        references / 'countries_br.csv', encoding='latin1', separator=';'
+    )['CO_PAIS_ISOA3']
+    codes = pl.concat([iso_baci, iso_br]).drop_nulls().unique().sort()
+    return pl.Enum(codes.to_list())
+
+
+def country(col: str) -> pl.Expr:
+    """ISO3 column cast to the country Enum; unknown codes become null."""
+    return pl.col(col).cast(country_enum(), strict=False)
+
+
+def country_names() -> pl.DataFrame:
+    """ISO3 code (country Enum) and Portuguese name of the countries of countries_br.csv.
+
+    Some codes have several names (UMI, ZZZ, GGY, KNA, PNG); only the first is
+    kept, so joining on the code never repeats rows.
+    """
+    return (
+        pl.read_csv(references / 'countries_br.csv', encoding='latin1', separator=';')
+        .unique('CO_PAIS_ISOA3', keep='first', maintain_order=True)
+        .select([country('CO_PAIS_ISOA3').alias('iso3'), pl.col('NO_PAIS').alias('name')])
+    )
+
+
+def sh6_label(col: str = 'sh6') -> pl.Expr:
+    """Zero-padded six-digit text of an SH6 code."""
+    return pl.col(col).cast(pl.String).str.zfill(6)
+
+
+def encode(df):
+    """Cast the code and label columns present in ``df`` to their compact dtypes.
+
+    Works on both DataFrames and LazyFrames.
+    """
+    schema = df.collect_schema()
+    exprs = [country(col) for col in COUNTRY_COLUMNS if col in schema]
+    exprs += [pl.col(col).cast(pl.Categorical) for col in LABEL_COLUMNS if col in schema]
+    if 'sh6' in schema:
+        exprs.append(pl.col('sh6').cast(SH6))
+    return df.with_columns(exprs)
+
+
+def decode(df: pl.DataFrame) -> pl.DataFrame:
+    """Inverse of :func:`encode` for display: Enum and Categorical columns as text, sh6 as its 6-digit code."""
+    exprs = [
+        pl.col(col).cast(pl.String)
+        for col, dtype in df.schema.items()
+        if dtype == pl.Categorical or isinstance(dtype, pl.Enum)
+    ]
+    if 'sh6' in df.columns:
+        exprs.append(pl.col('sh6').cast(pl.String).str.zfill(6))
+    return df.with_columns(exprs)
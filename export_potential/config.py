@@ -0,0 +1,41 @@
+"""Shared project paths and execution settings used by the pipeline stages.
+
+Settings are read from the environment (or a .env file at the project root):
+
+- EXPORT_POTENTIAL_STREAMING=1 runs the BACI stages out of core, in batches
+  of years processed by the polars streaming engine.
+- EXPORT_POTENTIAL_MEMORY_GB caps the size of each batch of years
+  in streaming mode and of each chunk of Monte Carlo draws (default 8).
+- EXPORT_POTENTIAL_SHOW_MEMORY=1 shows the memory use of the app process
+  in its sidebar.
+- EXPORT_POTENTIAL_CLUSTER_METHOD sets how analysis_epi groups the EPI
+  scores into categories: 'fixed' (default), 'kmeans' or 'jenks'.
+- EXPORT_POTENTIAL_CAGR_METHOD sets the growth rate of make_competitors:
+  'endpoints' (default) or 'regression'.
+- EXPORT_POTENTIAL_UNITS sets the exporting units of the batch EPI: 'states'
+  (default) or 'countries'.
+"""
+
+import os
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+######## Setting the directories ########
+project_root = Path(__file__).resolve().parents[1]
+data_raw = project_root / 'data' / 'raw'
+data_processed = project_root / 'data' / 'processed'
+data_interim = project_root / 'data' / 'interim'
+app_data = project_root / 'app' / 'data'
+references = project_root / 'references'
+reports = project_root / 'reports'
+
+######## Execution settings ########
+load_dotenv(project_root / '.env')
+
+streaming = os.getenv('EXPORT_POTENTIAL_STREAMING', '0') == '1'
+memory_limit_gb = float(os.getenv('EXPORT_POTENTIAL_MEMORY_GB', '8'))
+show_memory = os.getenv('EXPORT_POTENTIAL_SHOW_MEMORY', '0') == '1'
+cluster_method = os.getenv('EXPORT_POTENTIAL_CLUSTER_METHOD', 'fixed')
+cagr_method = os.getenv('EXPORT_POTENTIAL_CAGR_METHOD', 'endpoints')
+units = os.getenv('EXPORT_POTENTIAL_UNITS', 'states')
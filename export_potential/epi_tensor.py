@@ -0,0 +1,179 @@
+"""The EPI model as index-aligned arrays, for what-if queries.
+
+model_epi joins supply, demand and ease of trade on their keys and normalises
+each product with one more join. :class:`EPIModel` keeps the same inputs as
+arrays aligned on a product and an importer index: the supply share per
+product, the projected imports as a sparse product x importer matrix, and the
+ease of trade per importer. The EPI of every (product, importer) pair and its
+min-max normalisation per product are then a few vectorised operations over
+the stored entries, so a changed input is re-scored in milliseconds::
+
+    model = EPIModel.from_files()
+    model = model.with_ease({'ARG': 0.5}).scale_demand(1.1, sh6=[20714])
+    model.to_frame()
+
+Pairs missing from demand_potential, and importers without an ease of trade,
+have no EPI, as in model_epi.
+"""
+
+import numpy as np
+import polars as pl
+from scipy import sparse
+
+from export_potential.config import data_processed
+
+
+class EPIModel:
+    """Supply share, projected imports and ease of trade on shared product and importer indexes.
+
+    ``products`` and ``importers`` label the rows and columns of ``demand``
+    (a sparse matrix whose stored entries are the pairs in demand_potential);
+    ``supply`` is aligned with ``products`` and ``ease`` with ``importers``,
+    with NaN where the value is missing.
+    """
+
+    def __init__(self, products: np.ndarray, importers: np.ndarray, supply: np.ndarray,
+                 demand: sparse.csr_matrix, ease: np.ndarray):
+        self.products = np.asarray(products)
+        self.importers = np.asarray(importers)
+        self.supply = np.asarray(supply, dtype=np.float64)
+        self.demand = sparse.csr_matrix(demand, dtype=np.float64)
+        self.ease = np.asarray(ease, dtype=np.float64)
+        self.demand.sort_indices()
+
+        # Row of every stored entry, reused by every scoring
+        self._rows = np.repeat(np.arange(len(self.products)), np.diff(self.demand.indptr))
+
+    ######## Construction ########
+    @classmethod
+    def from_frames(cls, df_supply: pl.DataFrame, df_demand: pl.DataFrame, df_ease: pl.DataFrame,
+                    share: str = 'sc_share_proj_2027') -> 'EPIModel':
+        """Model of the supply (sh6, ``share``), demand and ease of trade frames of one exporter."""
+        products = df_supply['sh6'].to_numpy()
+        product_index = pl.DataFrame({'sh6': products, '_row': np.arange(len(products))})
+
+        # Only the products supplied enter the model, as in the join of model_epi
+        df_demand = (
+            df_demand.select(['importer', 'sh6', 'projected_import_value'])
+            .join(product_index, on='sh6', how='inner')
+        )
+        importers = np.unique(df_demand['importer'].cast(pl.String).to_numpy())
+        importer_index = pl.DataFrame({'importer': importers, '_col': np.arange(len(importers))})
+        df_demand = df_demand.with_columns(pl.col('importer').cast(pl.String)).join(importer_index, on='importer')
+
+        demand = sparse.csr_matrix(
+            (
+                df_demand['projected_import_value'].fill_null(np.nan).to_numpy(),
+                (df_demand['_row'].to_numpy(), df_demand['_col'].to_numpy())
+            ),
+            shape=(len(products), len(importers))
+        )
+
+        ease = (
+            importer_index
+            .join(
+                df_ease.select([pl.col('importer').cast(pl.String), 'ease_of_trade']),
+                on='importer',
+                how='left'
+            )
+            .sort('_col')['ease_of_trade']
+            .fill_null(np.nan)
+            .to_numpy()
+        )
+
+        return cls(
+            products, importers, df_supply[share].fill_null(np.nan).to_numpy(), demand, ease
+        )
+
+    @classmethod
+    def from_files(cls) -> 'EPIModel':
+        """Model of supply_potential_sc, demand_potential and ease_of_trade in data/processed/."""
+        return cls.from_frames(
+            pl.read_parquet(data_processed / 'supply_potential_sc.parquet'),
+            pl.read_parquet(data_processed / 'demand_potential.parquet'),
+            pl.read_parquet(data_processed / 'ease_of_trade.parquet'),
+        )
+
+    ######## What-if ########
+    def _replace(self, supply=None, demand=None, ease=None) -> 'EPIModel':
+        return EPIModel(
+            self.products,
+            self.importers,
+            self.supply if supply is None else supply,
+            self.demand if demand is None else demand,
+            self.ease if ease is None else ease,
+        )
+
+    def _positions(self, labels: np.ndarray, keys) -> np.ndarray:
+        positions = np.flatnonzero(np.isin(labels, list(keys)))
+        missing = set(keys) - set(labels[positions].tolist())
+        if missing:
+            raise KeyError(f'Not in the model: {sorted(missing)}')
+        return positions
+
+    def with_supply(self, shares: dict) -> 'EPIModel':
+        """Model with the supply share of the sh6 codes in ``shares`` replaced."""
+        supply = self.supply.copy()
+        positions = self._positions(self.products, shares)
+        supply[positions] = [shares[key] for key in self.products[positions].tolist()]
+        return self._replace(supply=supply)
+
+    def with_ease(self, ease: dict) -> 'EPIModel':
+        """Model with the ease of trade of the importers in ``ease`` replaced."""
+        values = self.ease.copy()
+        positions = self._positions(self.importers, ease)
+        values[positions] = [ease[key] for key in self.importers[positions].tolist()]
+        return self._replace(ease=values)
+
+    def scale_demand(self, factor: float, sh6=None, importers=None) -> 'EPIModel':
+        """Model with the projected imports multiplied by ``factor``.
+
+        ``sh6`` and ``importers`` restrict the change to those products and
+        importers (default: all).
+        """
+        rows = np.ones(len(self.products), dtype=bool)
+        cols = np.ones(len(self.importers), dtype=bool)
+        if sh6 is not None:
+            rows = np.isin(self.products, list(sh6))
+        if importers is not None:
+            cols = np.isin(self.importers, list(importers))
+
+        demand = self.demand.copy()
+        selected = rows[self._rows] & cols[demand.indices]
+        demand.data[selected] *= factor
+        return self._replace(demand=demand)
+
+    ######## Scores ########
+    def scores(self) -> np.ndarray:
+        """EPI of every stored (product, importer) entry, in the order of ``demand.data``."""
+        return self.supply[self._rows] * self.demand.data * self.ease[self.demand.indices]
+
+    def normalized(self, scores=None) -> np.ndarray:
+        """Min-max normalisation of ``scores`` within each product; NaN scores stay NaN."""
+        scores = self.scores() if scores is None else scores
+        valid = ~np.isnan(scores)
+
+        # The entries of a product are contiguous in CSR order, so each product is one segment
+        starts = self.demand.indptr[:-1]
+        filled = np.diff(self.demand.indptr) > 0
+        lowest = np.full(len(self.products), np.inf)
+        highest = np.full(len(self.products), -np.inf)
+        if filled.any():
+            lowest[filled] = np.minimum.reduceat(np.where(valid, scores, np.inf), starts[filled])
+            highest[filled] = np.maximum.reduceat(np.where(valid, scores, -np.inf), starts[filled])
+
+        low, high = lowest[self._rows], highest[self._rows]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            normalized = np.where(high != low, (scores - low) / (high - low), 0.0)
+        return np.where(valid, normalized, np.nan)
+
+    def to_frame(self) -> pl.DataFrame:
+        """The scored pairs (sh6, importer, epi_score, epi_score_normalized), without the NaN ones."""
+        scores = self.scores()
+        valid = ~np.isnan(scores)
+        return pl.DataFrame({
+            'sh6': self.products[self._rows[valid]],
+            'importer': self.importers[self.demand.indices[valid]],
+            'epi_score': scores[valid],
+            'epi_score_normalized': self.normalized(scores)[valid],
+        })
@@ -0,0 +1,89 @@
+"""Brazilian number formatting as polars expressions.
+
+:func:`contabil` and :func:`decimal` build the text shown in the app tables
+('1.234,5 mi', '12,3') with native string operations, so whole columns are
+formatted without calling Python once per row. :func:`format_contabil` and
+:func:`format_decimal` apply the same expressions to a single number.
+
+Numbers are rounded with ``round(decimals)`` (ties to even) before being
+written. On values whose binary representation sits next to a tie, the last
+digit can differ from Python's string formatting, which rounds the exact
+binary value (e.g. 12.345 gives '12,34' here and '12.35' with
+``f'{x:.2f}'``).
+"""
+
+import polars as pl
+
+CONTABIL_SCALES = [(1e9, ' bi'), (1e6, ' mi'), (1e3, ' mil')]
+
+# Integer parts are written through Int128, which holds every float below 1.7e38
+# exactly; larger magnitudes fall back to polars' float text ('1e+40')
+MAX_FIXED = 1e38
+
+
+def _expr(col) -> pl.Expr:
+    return pl.col(col) if isinstance(col, str) else col
+
+
+def _number(expr: pl.Expr, decimals: int, thousands: bool) -> pl.Expr:
+    """``expr`` with a decimal comma and, when ``thousands``, dots between thousands."""
+    # round() scales by 10 ** decimals, which loses precision from 2 ** 52 on; such values
+    # have no more fractional digits than shown, so the fraction is read from them directly
+    rounded = (
+        pl.when(expr.abs() * 10 ** decimals < 2.0 ** 52)
+        .then(expr.abs().round(decimals))
+        .otherwise(expr.abs())
+    )
+    whole = rounded.floor()
+    text = whole.cast(pl.Int128, strict=False).cast(pl.String)
+    if thousands:
+        # Dots every three digits, counted from the right
+        text = (
+            text.str.reverse()
+            .str.replace_all(r'(\d{3})', '${1}.')
+            .str.strip_chars_end('.')
+            .str.reverse()
+        )
+    if decimals:
+        fraction = ((rounded - whole) * 10 ** decimals).round(0).cast(pl.Int64, strict=False)
+        text = text + ',' + fraction.cast(pl.String).str.zfill(decimals)
+
+    return (
+        pl.when(expr.is_nan()).then(pl.lit('nan'))
+        .when(expr == float('inf')).then(pl.lit('inf'))
+        .when(expr == float('-inf')).then(pl.lit('-inf'))
+        .when(expr.abs() >= MAX_FIXED).then(expr.cast(pl.String))
+        # -0.0 keeps its sign, as in Python
+        .when((expr < 0) | ((expr == 0) & (1 / expr < 0))).then('-' + text)
+        .otherwise(text)
+    )
+
+
+def contabil(col, decimals: int = 1) -> pl.Expr:
+    """Value abbreviated in bi/mi/mil with Brazilian separators, e.g. '1.234,5 mi'."""
+    expr = _expr(col).cast(pl.Float64)
+    formatted = pl.when(expr.is_nan()).then(pl.lit('nan'))
+    for scale, suffix in CONTABIL_SCALES:
+        formatted = formatted.when(expr >= scale).then(
+            _number(expr / scale, decimals, True) + suffix
+        )
+    return formatted.otherwise(_number(expr, decimals, True))
+
+
+def decimal(col, decimals: int = 1) -> pl.Expr:
+    """Number with ``decimals`` places and a decimal comma, e.g. '12,3'."""
+    return _number(_expr(col).cast(pl.Float64), decimals, False)
+
+
+def format_contabil(value, decimals: int = 1) -> str:
+    """:func:`contabil` of a single number ('' for None)."""
+    if value is None:
+        return ''
+    return pl.select(contabil(pl.lit(value, dtype=pl.Float64), decimals)).item()
+
+
+def format_decimal(value, decimals: int = 1) -> str:
+    """:func:`decimal` of a single number ('' for None)."""
+    if value is None:
+        return ''
+    return pl.select(decimal(pl.lit(value, dtype=pl.Float64), decimals)).item()
@@ -0,0 +1,71 @@
+"""Compound annual growth rates over the years of a panel.
+
+:func:`cagr` computes the growth of ``value`` for every group in one sorted
+pass: the rows are aggregated per (group, year), sorted, and each group
+keeps either its first and last years (``method='endpoints'``) or the slope
+of a log-linear regression on all its years (``method='regression'``).
+"""
+
+import polars as pl
+
+CAGR_METHODS = ['endpoints', 'regression']
+
+
+def cagr(df, by: list, value: str = 'value', year: str = 'year',
+         method: str = 'endpoints') -> pl.LazyFrame:
+    """CAGR of ``value`` for each ``by`` group, as a fraction, in column 'cagr'.
+
+    ``method='endpoints'`` gives ``(last / first) ** (1 / years) - 1`` between
+    the first and last years of each group. ``method='regression'`` fits
+    ``ln(value) = a + b * year`` on every year with a positive value and
+    gives ``exp(b) - 1``, which is less sensitive to an atypical first or last
+    year; groups with a single such year get null.
+    """
+    if method not in CAGR_METHODS:
+        raise ValueError(f"Unknown CAGR method '{method}', use one of {CAGR_METHODS}")
+
+    yearly = (
+        df.lazy()
+        .group_by([*by, year])
+        .agg(pl.col(value).sum())
+        .sort([*by, year])
+    )
+
+    if method == 'endpoints':
+        return (
+            yearly
+            .group_by(by, maintain_order=True)
+            .agg([
+                pl.col(year).first().alias('min_year'),
+                pl.col(year).last().alias('max_year'),
+                pl.col(value).first().alias('start_value'),
+                pl.col(value).last().alias('end_value'),
+            ])
+            .select([
+                *by,
+                (
+                    (pl.col('end_value') / pl.col('start_value'))
+                    ** (1 / (pl.col('max_year') - pl.col('min_year')))
+                    - 1
+                ).alias('cagr')
+            ])
+        )
+
+    # Years are centred on the group's first year to keep the moments well conditioned
+    x = (pl.col(year) - pl.col(year).min()).cast(pl.Float64)
+    y = pl.col(value).log()
+    return (
+        yearly
+        .filter(pl.col(value) > 0)
+        .group_by(by, maintain_order=True)
+        .agg([
+            ((x * y).mean() - x.mean() * y.mean()).alias('covariance'),
+            ((x * x).mean() - x.mean() ** 2).alias('variance'),
+        ])
+        .select([
+            *by,
+            pl.when(pl.col('variance') > 0)
+            .then((pl.col('covariance') / pl.col('variance')).exp() - 1)
+            .alias('cagr')
+        ])
+    )
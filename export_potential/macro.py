@@ -0,0 +1,133 @@
+"""GDP, population and demand indexes for every projection horizon in one pass.
+
+gdp_growth.xlsx and pop_growth.xlsx hold one column per year. Here they are
+unpivoted to long (ISO, year) frames, the missing populations are filled
+with the 2015-2021 CAGR, and the yearly growth is accumulated with a
+cumulative product per country, so the index of every horizon year comes
+out of the same pass::
+
+    df_index = projection(read_reference('gdp_growth'), read_reference('pop_growth'),
+                          horizons=range(2025, 2031))
+
+gives (ISO, horizon, gdp_index, pop_index, demand_index) for 2025 to 2030.
+"""
+
+import polars as pl
+
+# First year of projected growth: the indexes accumulate growth from here to the horizon
+START_YEAR = 2022
+
+# Income elasticity of imports (mean estimate) used by make_demand
+ELASTICITY = 1.201
+
+# Accumulated GDP growth of Santa Catarina's exports up to 2027, used by make_supply
+ACC_GROWTH_GDP = 1.195
+
+# Years of the population CAGR used to fill missing (zero) populations
+CAGR_START, CAGR_END = 2015, 2021
+
+
+def _years(df: pl.DataFrame) -> list:
+    return [col for col in df.columns if col.isdigit()]
+
+
+######## Long tables ########
+def gdp_growth(df_gdp_growth: pl.DataFrame) -> pl.DataFrame:
+    """Yearly GDP growth (ISO, year, gdp_growth) of gdp_growth.xlsx; gaps get the mean of the year."""
+    years = _years(df_gdp_growth)
+    return (
+        df_gdp_growth
+        .with_columns([pl.col(year).fill_null(pl.col(year).mean()) for year in years])
+        .unpivot(index=['ISO'], on=years, variable_name='year', value_name='gdp_growth')
+        .with_columns(pl.col('year').cast(pl.Int64))
+    )
+
+
+def population(df_pop: pl.DataFrame) -> pl.DataFrame:
+    """Population (ISO, year, population) of pop_growth.xlsx.
+
+    Missing (zero) populations are extrapolated from 2015 with the country's
+    2015-2021 CAGR.
+    """
+    df_pop = (
+        df_pop
+        .unpivot(index=['ISO'], on=_years(df_pop), variable_name='year', value_name='population')
+        .with_columns([pl.col('year').cast(pl.Int64), pl.col('population').cast(pl.Int64)])
+    )
+
+    def at(year):
+        return pl.col('population').filter(pl.col('year') == year).first().over('ISO')
+
+    cagr = (at(CAGR_END) / at(CAGR_START)) ** (1 / (CAGR_END - CAGR_START)) - 1
+    start = pl.when(at(CAGR_START) != 0).then(at(CAGR_START))
+    return (
+        df_pop
+        .with_columns(
+            pl.when(pl.col('population') != 0)
+            .then(pl.col('population'))
+            .otherwise((start * (1 + cagr) ** (pl.col('year') - CAGR_START)).cast(pl.Int64))
+            .alias('population')
+        )
+        .sort(['ISO', 'year'])
+    )
+
+
+def population_growth(df_pop: pl.DataFrame) -> pl.DataFrame:
+    """Yearly population growth (ISO, year, pop_growth) of pop_growth.xlsx, after :func:`population`."""
+    return (
+        population(df_pop)
+        .with_columns(
+            (pl.col('population') / pl.col('population').shift(1).over('ISO') - 1).alias('pop_growth')
+        )
+        .select(['ISO', 'year', 'pop_growth'])
+    )
+
+
+######## Indexes ########
+def cumulative_index(df_growth: pl.DataFrame, growth: str, alias: str, horizons=None,
+                     by=('ISO',), start: int = START_YEAR) -> pl.DataFrame:
+    """Growth accumulated from ``start`` to every horizon year (*by, horizon, ``alias``).
+
+    ``horizons`` defaults to every year of ``df_growth`` from ``start`` on. A
+    group missing the growth of any year up to a horizon gets a null index
+    for it.
+    """
+    by = list(by)
+    last_year = df_growth['year'].max()
+    horizons = list(range(start, last_year + 1) if horizons is None else horizons)
+    beyond = [year for year in horizons if year > last_year or year < start]
+    if beyond:
+        raise ValueError(f"Horizon(s) {beyond} outside {start}-{last_year}, the years of '{growth}'")
+
+    missing = pl.col(growth).is_null().cum_sum().over(by) > 0
+    return (
+        df_growth
+        .filter(pl.col('year').is_between(start, max(horizons)))
+        .sort([*by, 'year'])
+        .with_columns(
+            pl.when(missing).then(None).otherwise((1 + pl.col(growth)).cum_prod().over(by)).alias(alias)
+        )
+        .filter(pl.col('year').is_in(horizons))
+        .select([*by, pl.col('year').alias('horizon'), alias])
+    )
+
+
+def demand_index(elasticity=ELASTICITY) -> pl.Expr:
+    """Population index times the per capita GDP index raised to ``elasticity`` (a number or a column)."""
+    if isinstance(elasticity, str):
+        elasticity = pl.col(elasticity)
+    return (pl.col('gdp_index') / pl.col('pop_index')) ** elasticity * pl.col('pop_index')
+
+
+def projection(df_gdp_growth: pl.DataFrame, df_pop: pl.DataFrame, horizons=None,
+               elasticity: float = ELASTICITY) -> pl.DataFrame:
+    """GDP, population and demand indexes (ISO, horizon, gdp_index, pop_index, demand_index)
+    of the countries with both GDP and population, for every horizon year.
+    """
+    df_gdp_index = cumulative_index(gdp_growth(df_gdp_growth), 'gdp_growth', 'gdp_index', horizons)
+    df_pop_index = cumulative_index(population_growth(df_pop), 'pop_growth', 'pop_index', horizons)
+    return (
+        df_gdp_index
+        .join(df_pop_index, on=['ISO', 'horizon'], how='inner')
+        .with_columns(demand_index(elasticity).alias('demand_index'))
+    )
@@ -0,0 +1,56 @@
+import polars as pl
+
+from export_potential.app_index import indexed_tables
+from export_potential.app_store import publish
+from export_potential.config import app_data
+from export_potential.reference_data import read_reference
+
+tables = {}
+
+# Tabelas de app/data que nenhum estágio escreve: sem o Parquet, a tabela fica fora da versão
+# publicada e o app avisa na aba que precisa dela
+def read_optional(name):
+    path = app_data / f'{name}.parquet'
+    if not path.exists():
+        print(f'{path} not found, skipping its app tables')
+        return None
+    return pl.read_parquet(path)
+
+######## Overview tables ########
+# Lidas inteiras pela aba 'Visão geral' e pelo mapa tarifário
+for name in ['epi_scores_sh6', 'epi_scores_countries', 'epi_scores_sc_comp']:
+    tables[name] = pl.read_parquet(app_data / f'{name}.parquet')
+
+df_tariff = read_optional('df_tariff_brazil')
+if df_tariff is not None:
+    tables['df_tariff_brazil'] = df_tariff
+
+tables['munic_vp'] = read_reference('munic_vp')
+
+######## EPI scores by product ########
+# Aba 'Produtos e mercados': países do produto em ordem decrescente de Índice PE
+df_epi = read_optional('epi_scores_processed')
+
+if df_epi is not None:
+    tables.update(indexed_tables(df_epi, 'epi_scores', keys=['sh6_product'], by='epi_score_normalized'))
+
+######## Markets by product ########
+# Mercados do produto em ordem decrescente de valor importado
+df_markets = read_optional('app_dataset_processed')
+
+if df_markets is not None:
+    tables.update(indexed_tables(df_markets, 'markets', keys=['sh6_product'], by='value'))
+
+######## Suppliers by product and importer ########
+# Aba 'Fornecedores': fornecedores de cada par (produto, país) em ordem decrescente de valor
+df_competitors = pl.read_parquet(app_data / 'df_competitors.parquet')
+
+tables.update(
+    indexed_tables(df_competitors, 'competitors', keys=['sh6_product', 'importer_name'], by='value')
+)
+
+######## Publishing ########
+# Nova versão em app/data/store/<versão>/ com manifest.json; o ponteiro 'current' é trocado no fim
+version = publish(tables)
+
+print(f'App data version {version}')
@@ -0,0 +1,6 @@
+from export_potential.baci import baci_dataset, convert_baci
+
+######## Converting the raw BACI files ########
+converted = convert_baci()
+
+print(f'{len(converted)} file(s) converted into {baci_dataset}')
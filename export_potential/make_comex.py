@@ -0,0 +1,62 @@
+import polars as pl
+
+from export_potential.baci import collect_baci
+from export_potential.codes import encode
+from export_potential.config import data_interim
+from export_potential.weighting import weighted_average
+
+
+def yearly_trade(df_all: pl.LazyFrame, side: str) -> pl.LazyFrame:
+    """Trade by year, ``side`` (exporter or importer) and product."""
+    # Summing as decimals keeps the totals exact, so they do not depend on the
+    # order rows reach the aggregation (all at once or in streaming batches)
+    return df_all.group_by([
+        'year', side, 'sh6', 'product_description']).agg([
+        pl.col('value').cast(pl.Decimal(38, 3)).sum().cast(pl.Float64).alias('value'),
+        pl.col('quantity').cast(pl.Decimal(38, 3)).sum().cast(pl.Float64).alias('quantity')
+    ])
+
+
+def weighted_trade(df_side: pl.LazyFrame, side: str, alias: str) -> pl.LazyFrame:
+    """Yearly trade by ``side`` with the 5-year weighted average ending at each year."""
+    weighted = weighted_average(
+        df_side,
+        by=[side, 'sh6', 'product_description'],
+        value='value',
+        alias=alias
+    )
+
+    return (
+        df_side
+        .join(
+            weighted.select([pl.col('base_year').alias('year'), side, 'sh6', alias]),
+            on=['year', side, 'sh6'],
+            how='left'
+        )
+        .sort(['year', side, 'sh6'])
+    )
+
+
+######## Loading the data ########
+# Exports and imports come from the same scan: both aggregations are
+# collected together and the bilateral data is read only once
+df_exps, df_imps = collect_baci(
+    lambda df_all: [yearly_trade(df_all, 'exporter'), yearly_trade(df_all, 'importer')]
+)
+
+df_exps = df_exps.sort(['year', 'exporter', 'sh6'])
+df_imps = df_imps.sort(['year', 'importer', 'sh6'])
+
+######## Weighting the last 5 years ########
+# Every year gets the average of its own window, so the files carry the
+# full historical series; downstream stages use the latest year
+df_exps, df_imps = pl.collect_all([
+    weighted_trade(df_exps.lazy(), 'exporter', 'weighted_exports'),
+    weighted_trade(df_imps.lazy(), 'importer', 'weighted_imports'),
+])
+
+df_exps.head()
+df_imps.head()
+
+encode(df_exps).write_parquet(data_interim / 'comex_exps_weighted.parquet')
+encode(df_imps).write_parquet(data_interim / 'comex_imps_weighted.parquet')
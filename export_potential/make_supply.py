@@ -5,32 +5,28 @@ SCRIPT E CÁLCULOS VALIDADOS - MATHEUS SOUZA DA ROSA - 07/10/2025
 '''
 
 import polars as pl
-from pathlib import Path
 
-######## Setting the directories ########
-project_root = Path(__file__).resolve().parents[1]
-data_raw = project_root / 'data' / 'raw'
-data_processed = project_root / 'data' / 'processed'
-data_interim = project_root / 'data' / 'interim'
-references = project_root / 'references'
+from export_potential import macro
+from export_potential.codes import SH6, country, encode
+from export_potential.config import data_interim, data_processed
+from export_potential.reference_data import read_reference
+from export_potential.weighting import weighted_average
 
 ######## Loading the data ########
-df_all = pl.read_parquet(data_interim / 'comex_exps_weighted.parquet')
-
-df_all.head()
+df_all = pl.scan_parquet(data_interim / 'comex_exps_weighted.parquet')
 
 ######## Filtering for Brazil and estimating SC share ########
-df_all_bra = df_all.filter(pl.col('exporter') == 'BRA')
+df_all_bra = df_all.filter(pl.col('exporter') == 'BRA').collect()
 
 df_all_bra.head()
 
-df_shares_sc = pl.read_excel(references / 'share_sc.xlsx')
+df_shares_sc = read_reference('share_sc')
 
 df_all_bra.head()
 df_shares_sc.head()
 
 df_shares_sc = df_shares_sc.with_columns([
-    pl.col('sh6').cast(pl.Int64)
+    pl.col('sh6').cast(SH6)
 ])
 
 df_shares_sc = df_shares_sc.unpivot(
@@ -62,30 +58,13 @@ df_all_bra = df_all_bra.with_columns([
 df_all_bra.head()
 
 # Calculating weighted average of exports of SC over the last 5 years
-pesos = [0.2, 0.4, 0.6, 0.8, 1.0]
-
-recent_years = sorted(df_all_bra['year'].unique(), reverse=True)[:5]
-df_recent = df_all_bra.filter(pl.col('year').is_in(recent_years))
-
-weighted_exports = (
-    df_recent
-    .with_columns([
-        pl.when(pl.col('year') == recent_years[0]).then(pesos[4])
-         .when(pl.col('year') == recent_years[1]).then(pesos[3])
-         .when(pl.col('year') == recent_years[2]).then(pesos[2])
-         .when(pl.col('year') == recent_years[3]).then(pesos[1])
-         .when(pl.col('year') == recent_years[4]).then(pesos[0])
-         .otherwise(0)
-         .alias('peso')
-    ])
-    .with_columns([
-        (pl.col('valor_sc') * pl.col('peso')).alias('weighted_value_sc')
-    ])
-    .group_by(['exporter', 'sh6', 'product_description'])
-    .agg([
-        (pl.sum('weighted_value_sc') / pl.sum('peso')).alias('weighted_exports_sc')
-    ])
-)
+weighted_exports = weighted_average(
+    df_all_bra,
+    by=['exporter', 'sh6', 'product_description'],
+    value='valor_sc',
+    alias='weighted_exports_sc',
+    base_years=[df_all_bra['year'].max()]
+).collect()
 
 df_all_bra = df_all_bra.join(
     weighted_exports.select(['exporter', 'sh6', 'weighted_exports_sc']),
@@ -105,43 +84,29 @@ df_all_bra.shape
 
 
 ########## Projecting exports for SC ##########
-acc_growth_gdp = 1.195
+acc_growth_gdp = macro.ACC_GROWTH_GDP
 
 df_all_bra = df_all_bra.with_columns([
     (pl.col('weighted_exports_sc') * acc_growth_gdp).alias('proj_exports_sc_2027')
 ])
 
 ########## Projecting exports for all countries ##########
-df_gdp_growth = pl.read_excel(references / 'gdp_growth.xlsx')
+df_gdp_growth = read_reference('gdp_growth')
 
 df_gdp_growth.head()
 
-# Setting the mean GDP growth rate for countries without specific data
-for col in df_gdp_growth.columns:
-    if df_gdp_growth[col].null_count() > 0 and df_gdp_growth[col].dtype in [pl.Float64, pl.Int64]:
-        mean_value = df_gdp_growth[col].mean()
-        df_gdp_growth = df_gdp_growth.with_columns(
-            pl.col(col).fill_null(mean_value).alias(col)
-        )
-
-# Accumulated growth from 2022 to 2027
-growth_cols = [str(year) for year in range(2022, 2028)]
-
-df_gdp_growth = df_gdp_growth.with_columns([
-    pl.fold(
-        acc=pl.lit(1.0),
-        function=lambda acc, x: acc * (1 + x),
-        exprs=[pl.col(col) for col in growth_cols]
-    ).alias('gdp_index_2027')
-])
+# Accumulated growth from 2022 to 2027, with the mean GDP growth rate for countries without specific data
+df_gdp_growth = macro.cumulative_index(
+    macro.gdp_growth(df_gdp_growth), 'gdp_growth', 'gdp_index_2027', horizons=[2027]
+)
 
-df_gdp_growth = df_gdp_growth.select(['ISO', 'gdp_index_2027'])
+df_gdp_growth = df_gdp_growth.select([country('ISO'), 'gdp_index_2027'])
 
 df_all.head()
 df_gdp_growth.head()
 
 # Calculating projected exports for all countries
-df_all = df_all.filter(pl.col('year') == 2023)
+df_all = df_all.filter(pl.col('year') == 2023).collect()
 
 df_all = df_all.join(
     df_gdp_growth,
@@ -189,7 +154,7 @@ df_supply_sc = df_supply_sc.sort('sc_share_proj_2027', descending=True)
 
 df_supply_sc.head()
 
-df_supply_sc.write_parquet(data_processed / 'supply_potential_sc.parquet')
+encode(df_supply_sc).write_parquet(data_processed / 'supply_potential_sc.parquet')
 
 
 
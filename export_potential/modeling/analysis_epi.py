@@ -1,30 +1,48 @@
 import polars as pl
-from pathlib import Path
-from sklearn.cluster import KMeans
-import numpy as np
-import pandas as pd
-
-import warnings
-warnings.filterwarnings("ignore")
-
-######## Setting the directories ########
-project_root = Path(__file__).resolve().parents[2]
-data_raw = project_root / 'data' / 'raw'
-data_processed = project_root / 'data' / 'processed'
-data_interim = project_root / 'data' / 'interim'
-app_data = project_root / 'app' / 'data'
-references = project_root / 'references'
-
-def clusterize_group(group):
-    group = group.copy()
-    # Definir categorias por intervalo fixo
-    bins = [0, 0.02, 0.04, 0.06, 0.2, 1.01]
-    labels = ['Baixo', 'Médio-baixo', 'Médio', 'Médio-alto', 'Alto']
-    group['categoria'] = pd.cut(group['epi_score_normalized'], bins=bins, labels=labels, include_lowest=True, right=False)
-    group['categoria'] = group['categoria'].astype(str)  # Garantir que os labels apareçam como texto
-    group['cluster'] = pd.Categorical(group['categoria'], categories=labels, ordered=True).codes
-    group = group.sort_values(by=['cluster'], ascending=False)
-    return group
+
+from export_potential.clustering import CLUSTER_METHODS, assign_clusters
+from export_potential.codes import encode
+from export_potential.config import app_data, cluster_method, data_processed
+
+# Categorias por intervalo fixo do epi_score_normalized: [0, 0.02), [0.02, 0.04), ..., [0.2, 1.01)
+CATEGORY_BOUNDS = (0, 1.01)
+CATEGORY_BREAKS = [0.02, 0.04, 0.06, 0.2]
+CATEGORY_LABELS = ['Baixo', 'Médio-baixo', 'Médio', 'Médio-alto', 'Alto']
+CATEGORY = pl.Enum(CATEGORY_LABELS)
+
+# 'fixed' usa os intervalos acima; 'kmeans' e 'jenks' ajustam as cinco classes aos scores de cada grupo
+# (EXPORT_POTENTIAL_CLUSTER_METHOD)
+CLUSTER_METHOD = cluster_method
+if CLUSTER_METHOD not in ['fixed', *CLUSTER_METHODS]:
+    raise ValueError(f"Unknown cluster method '{CLUSTER_METHOD}', use one of {['fixed', *CLUSTER_METHODS]}")
+
+def clusterize_group(group: pl.DataFrame, by=()) -> pl.DataFrame:
+    # Com 'fixed' as categorias dependem só do score de cada linha; 'by' ordena os grupos antes do
+    # cluster e, nos outros métodos, define os grupos em que as classes são ajustadas
+    score = pl.col('epi_score_normalized')
+    if CLUSTER_METHOD == 'fixed':
+        group = group.with_columns(
+            pl.when(score.is_between(*CATEGORY_BOUNDS, closed='left'))
+            .then(score.cut(CATEGORY_BREAKS, labels=CATEGORY_LABELS, left_closed=True))
+            .cast(CATEGORY)
+            .alias('categoria')
+        )
+        # Cluster é a posição da categoria (0 = Baixo ... 4 = Alto); -1 fora do intervalo
+        group = group.with_columns(
+            pl.col('categoria').to_physical().cast(pl.Int8).fill_null(-1).alias('cluster')
+        )
+    else:
+        group = assign_clusters(
+            group, 'epi_score_normalized', by=by, method=CLUSTER_METHOD, k=len(CATEGORY_LABELS)
+        )
+        group = group.with_columns(
+            pl.col('cluster')
+            .replace_strict(dict(enumerate(CATEGORY_LABELS)), default=None, return_dtype=CATEGORY)
+            .alias('categoria')
+        )
+    return group.sort(
+        [*by, 'cluster'], descending=[False] * len(by) + [True], maintain_order=True
+    )
 
 ######## Loading the data ########
 df_epi = pl.read_parquet(data_processed / 'epi_scores.parquet')
@@ -48,11 +66,9 @@ df_epi_sh6 = df_epi_sh6.with_columns([
     ((pl.col('epi_score') - epi_min) / (epi_max - epi_min)).alias('epi_score_normalized')
 ])
 
-df_epi_sh6_pd = df_epi_sh6.to_pandas()
-df_epi_sh6_clustered = clusterize_group(df_epi_sh6_pd)
-df_epi_sh6 = pl.from_pandas(df_epi_sh6_clustered)
+df_epi_sh6 = clusterize_group(df_epi_sh6)
 
-df_epi_sh6.write_parquet(app_data / 'epi_scores_sh6.parquet')
+encode(df_epi_sh6).write_parquet(app_data / 'epi_scores_sh6.parquet')
 
 ######################### AGREGGATING BY COUNTRY #########################
 df_epi = df_epi.with_columns([
@@ -73,28 +89,21 @@ df_epi_country = df_epi_country.with_columns([
     ((pl.col('epi_score') - epi_min) / (epi_max - epi_min)).alias('epi_score_normalized')
 ])
 
-df_epi_country_pd = df_epi_country.to_pandas()
-df_epi_country_clustered = clusterize_group(df_epi_country_pd)
-df_epi_country = pl.from_pandas(df_epi_country_clustered)
+df_epi_country = clusterize_group(df_epi_country)
 
 df_epi_country = df_epi_country.sort('epi_score_normalized', descending=True)
 
-df_epi_country.write_parquet(app_data / 'epi_scores_countries.parquet')
+encode(df_epi_country).write_parquet(app_data / 'epi_scores_countries.parquet')
 
 df_epi_country.head()
 
 ######################### PRODUCT AND MARKET #########################
 df_epi.head()
 
-df_epi_clustered_list = []
-for sh6, group in df_epi.to_pandas().groupby('sh6'):
-    clustered = clusterize_group(group)
-    df_epi_clustered_list.append(clustered)
-
-df_epi_clustered = pd.concat(df_epi_clustered_list, ignore_index=True)
-df_epi = pl.from_pandas(df_epi_clustered)
+# Uma única passada: produtos em ordem de sh6 e, dentro de cada um, do maior cluster ao menor
+df_epi = clusterize_group(df_epi, by=['sh6'])
 
-df_epi.write_parquet(app_data / 'epi_scores.parquet')
+encode(df_epi).write_parquet(app_data / 'epi_scores.parquet')
 
 ######################### SC COMPETITIVA #########################
 df_epi_comp = df_epi.group_by(['sc_comp', 'color']).agg([
@@ -109,12 +118,10 @@ df_epi_comp = df_epi_comp.with_columns([
     ((pl.col('epi_score') - epi_min) / (epi_max - epi_min)).alias('epi_score_normalized')
 ])
 
-df_epi_comp_pd = df_epi_comp.to_pandas()
-df_epi_comp_clustered = clusterize_group(df_epi_comp_pd)
-df_epi_comp = pl.from_pandas(df_epi_comp_clustered)
+df_epi_comp = clusterize_group(df_epi_comp)
 
 df_epi_comp = df_epi_comp.sort('epi_score_normalized', descending=False)
 
-df_epi_comp.write_parquet(app_data / 'epi_scores_sc_comp.parquet')
+encode(df_epi_comp).write_parquet(app_data / 'epi_scores_sc_comp.parquet')
 
 df_epi_comp.head()
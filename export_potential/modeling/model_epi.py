@@ -1,13 +1,8 @@
 import polars as pl
-from pathlib import Path
 
-######## Setting the directories ########
-project_root = Path(__file__).resolve().parents[2]
-app = project_root / 'app'
-data_raw = project_root / 'data' / 'raw'
-data_processed = project_root / 'data' / 'processed'
-data_interim = project_root / 'data' / 'interim'
-references = project_root / 'references'
+from export_potential.codes import SH6, country, encode, sh6_label
+from export_potential.config import data_interim, data_processed, references
+from export_potential.reference_data import read_reference
 
 ######## Loading the data ########
 df_ease = pl.read_parquet(data_processed / 'ease_of_trade.parquet')
@@ -83,17 +78,14 @@ df_countries.head()
 
 df_epi = df_epi.join(
     df_countries.select([
-        pl.col('CO_PAIS_ISOA3').alias('importer'),
+        country('CO_PAIS_ISOA3').alias('importer'),
         pl.col('NO_PAIS').alias('importer_name')]),
     on='importer',
     how='left'
 )
 
-df_epi = df_epi.with_columns([
-    pl.col('sh6').cast(str).str.zfill(6).alias('sh6')
-])
-
-df_products = pl.read_excel(references / 'products_br_mdic.xlsx')
+df_products = read_reference('products_br_mdic')
+df_products = df_products.with_columns(pl.col('CO_SH6').cast(SH6))
 df_products.head()
 
 df_epi = df_epi.join(
@@ -104,12 +96,13 @@ df_epi = df_epi.join(
 )
 
 df_epi = df_epi.with_columns([
-    (pl.col('sh6') + ' - ' + pl.col('NO_SH6_POR')).alias('sh6_product')
+    (sh6_label() + ' - ' + pl.col('NO_SH6_POR')).alias('sh6_product')
 ])
 
 df_epi = df_epi.rename({'NO_SH6_POR': 'product_description_br'})
 
-df_sc_comp = pl.read_excel(references / 'sh6_mundo_comp.xlsx')
+df_sc_comp = read_reference('sh6_mundo_comp')
+df_sc_comp = df_sc_comp.with_columns(pl.col('sh6').cast(SH6))
 
 df_sc_comp.head()
 
@@ -144,14 +137,14 @@ cores_comp = ({
     'Têxtil, Confecção, Couro e Calçados': '#F05534'
 })
 
-# Converter para pandas
-df_epi = df_epi.to_pandas()
-
-df_epi['color'] = df_epi['sc_comp'].apply(lambda x: cores_comp.get(x, '#000000'))
-
-df_epi = pl.from_pandas(df_epi)
+df_epi = df_epi.with_columns([
+    pl.col('sc_comp')
+    .replace_strict(cores_comp, default='#000000', return_dtype=pl.String)
+    .fill_null('#000000')
+    .alias('color')
+])
 
 df_epi = df_epi.select(['exporter', 'importer', 'importer_name', 'sh6', 'sh6_product', 'product_description_br', 'sc_comp', 'color',
                         'bilateral_exports_sc_sh6', 'proj_exports_sc_2027', 'projected_import_value', 'epi_score', 'epi_score_normalized'])
 
-df_epi.write_parquet(data_processed / 'epi_scores.parquet')
\ No newline at end of file
+encode(df_epi).write_parquet(data_processed / 'epi_scores.parquet')
\ No newline at end of file
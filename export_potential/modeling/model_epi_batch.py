@@ -0,0 +1,63 @@
+import polars as pl
+
+from export_potential import batch_epi
+from export_potential.baci import baci_years, collect_baci
+from export_potential.codes import SH6, encode
+from export_potential.config import data_interim, data_processed, units
+from export_potential.reference_data import read_reference
+
+# 'states' aplica cada references/share_<uf>.xlsx às exportações do Brasil; 'countries' calcula o EPI
+# de todos os exportadores, cada um como sua própria unidade (EXPORT_POTENTIAL_UNITS)
+UNITS = units
+if UNITS not in ['states', 'countries']:
+    raise ValueError(f"Unknown units '{UNITS}', use 'states' or 'countries'")
+
+######## Loading the data ########
+shares = batch_epi.unit_shares()
+
+# Em 'countries' o cálculo fica restrito aos produtos das tabelas de participação
+products = shares.select(pl.col('sh6').unique()).to_series().implode()
+
+if UNITS == 'countries':
+    shares = None
+
+df_exports = pl.read_parquet(data_interim / 'comex_exps_weighted.parquet')
+if shares is None:
+    df_exports = df_exports.filter(pl.col('sh6').is_in(products))
+df_demand = pl.read_parquet(data_processed / 'demand_potential.parquet')
+df_gdp_index = batch_epi.gdp_index(read_reference('gdp_growth'))
+
+# Em 'states' entram todas as exportações do Brasil, como em make_supply e make_ease; em 'countries',
+# as de todos os exportadores nos produtos selecionados
+def select_flows(df_all):
+    if shares is None:
+        df_all = df_all.filter(pl.col('sh6').cast(SH6).is_in(products))
+    else:
+        df_all = df_all.filter(pl.col('exporter') == batch_epi.PARENT)
+    return [df_all.select(['year', 'exporter', 'importer', 'sh6', 'value'])]
+
+
+df_flows, = collect_baci(select_flows, years=baci_years()[-5:])
+
+df_flows = df_flows.sort(['year', 'exporter', 'importer', 'sh6'])
+
+######## Supply, ease of trade and EPI of every unit ########
+df_supply = batch_epi.supply(
+    df_exports,
+    shares,
+    df_gdp_index,
+    growth=batch_epi.ACC_GROWTH_GDP if shares is not None else None
+)
+
+df_supply.head()
+
+df_bilateral_sh6 = batch_epi.bilateral_exports(df_flows, shares)
+df_ease = batch_epi.ease_of_trade(df_bilateral_sh6, df_demand, df_supply)
+
+df_ease.head()
+
+df_epi = batch_epi.epi_scores(df_supply, df_demand, df_ease, df_bilateral_sh6)
+
+df_epi.head()
+
+encode(df_epi).write_parquet(data_processed / 'epi_scores_batch.parquet')
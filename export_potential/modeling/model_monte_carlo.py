@@ -0,0 +1,30 @@
+import polars as pl
+
+from export_potential import monte_carlo
+from export_potential.codes import encode
+from export_potential.config import data_interim, data_processed
+from export_potential.reference_data import read_reference
+
+######## Loading the data ########
+settings = monte_carlo.load_settings()
+
+df_epi = pl.read_parquet(data_processed / 'epi_scores.parquet')
+df_supply = pl.read_parquet(data_processed / 'supply_potential_sc.parquet')
+df_demand = pl.read_parquet(data_processed / 'demand_potential.parquet')
+df_exports = pl.read_parquet(data_interim / 'comex_exps_weighted.parquet')
+df_bilateral_sh6 = pl.read_parquet(data_interim / 'bilateral_exports_sh6.parquet')
+
+inputs = monte_carlo.build_inputs(
+    df_epi, df_supply, df_demand, df_exports, df_bilateral_sh6,
+    read_reference('gdp_growth'), read_reference('pop_growth'),
+    horizon=settings['horizon']
+)
+
+######## Simulating ########
+df_bands = monte_carlo.simulate(inputs, settings)
+
+df_bands = df_bands.sort(['sh6', 'rank'])
+
+df_bands.head()
+
+encode(df_bands).write_parquet(data_processed / 'epi_monte_carlo.parquet')
@@ -0,0 +1,75 @@
+import shutil
+
+import polars as pl
+
+from export_potential import batch_epi, scenarios
+from export_potential.baci import baci_years, collect_baci
+from export_potential.codes import encode
+from export_potential.config import data_interim, data_processed
+from export_potential.reference_data import read_reference
+
+######## Loading the data ########
+df_scenarios = scenarios.load_scenarios()
+
+shares = batch_epi.unit_shares()
+
+df_exports = pl.read_parquet(data_interim / 'comex_exps_weighted.parquet')
+df_imports = (
+    pl.scan_parquet(data_interim / 'comex_imps_weighted.parquet')
+    # Ano base: o mais recente do comex
+    .filter(pl.col('year') == pl.col('year').max())
+    .collect()
+)
+
+df_flows, = collect_baci(
+    lambda df_all: [
+        df_all
+        .filter(pl.col('exporter') == batch_epi.PARENT)
+        .select(['year', 'exporter', 'importer', 'sh6', 'value'])
+    ],
+    years=baci_years()[-5:]
+)
+
+df_flows = df_flows.sort(['year', 'exporter', 'importer', 'sh6'])
+
+######## Índices de PIB e de demanda de todos os cenários ########
+df_gdp_index, df_demand_index = scenarios.macro_indexes(
+    df_scenarios, read_reference('gdp_growth'), read_reference('pop_growth')
+)
+
+df_demand = scenarios.project_demand(df_imports, df_scenarios, df_demand_index)
+
+df_demand.head()
+
+######## Oferta, facilidade de comércio e EPI de todos os cenários ########
+by = ['scenario', 'unit']
+
+df_units = batch_epi.unit_exports(df_exports, shares).join(
+    df_scenarios.select(['scenario', pl.col('acc_growth_gdp').alias('growth')]),
+    how='cross'
+)
+
+df_supply = batch_epi.project_supply(
+    df_units, batch_epi.world_exports(df_exports, df_gdp_index), by=by
+)
+
+df_supply.head()
+
+# As exportações bilaterais não dependem do cenário
+df_bilateral_sh6 = batch_epi.bilateral_exports(df_flows, shares)
+df_ease = batch_epi.ease_of_trade(df_bilateral_sh6, df_imports, df_supply, by=by)
+
+df_epi = batch_epi.epi_scores(df_supply, df_demand, df_ease, df_bilateral_sh6, by=by)
+
+df_epi = df_epi.join(
+    df_demand.select(['scenario', 'importer', 'sh6', 'demand_index']),
+    on=['scenario', 'importer', 'sh6'],
+    how='left',
+    maintain_order='left'
+)
+
+df_epi.head()
+
+# Um diretório por cenário (scenario=<nome>/), reescrito a cada execução
+shutil.rmtree(data_processed / 'epi_scenarios', ignore_errors=True)
+encode(df_epi).write_parquet(data_processed / 'epi_scenarios', partition_by='scenario', mkdir=True)
@@ -0,0 +1,355 @@
+"""Monte Carlo uncertainty bands for the EPI of Santa Catarina.
+
+Each draw perturbs the yearly GDP and population growth of every country and
+the income elasticity with the distributions in
+``references/monte_carlo.toml``::
+
+    draws = 2000
+    seed = 0
+
+    [gdp_shock]               # added to each country's growth in each year
+    distribution = 'normal'
+    sd = 0.01
+
+    [elasticity]
+    distribution = 'triangular'
+    low = 1.0
+    mode = 1.201
+    high = 1.4
+
+and recomputes what depends on them: the demand index of every importer,
+the world export projection that divides SC's supply, the ease of trade and
+the EPI of every (sh6, importer) pair of epi_scores.parquet. A draw is a row
+of NumPy arrays, so a chunk of draws is scored with broadcasting and sparse
+matrix products; the chunk size follows the memory budget.
+
+Scores and ranks of every draw go to memory-mapped files in
+data/interim/monte_carlo/, and the p5/p50/p95 bands and the rank stability
+(share of draws in which a pair keeps its rank within the product) are then
+read back in blocks of pairs.
+"""
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
+from typing import NamedTuple
+
+import numpy as np
+import polars as pl
+from scipy import sparse
+
+from export_potential.codes import country
+from export_potential.config import data_interim, memory_limit_gb, references
+from export_potential.macro import START_YEAR, gdp_growth, population_growth
+from export_potential.scenarios import BASE_SCENARIO
+
+simulation_file = references / 'monte_carlo.toml'
+simulation_scratch = data_interim / 'monte_carlo'
+
+DISTRIBUTIONS = ['normal', 'uniform', 'triangular']
+PERCENTILES = [5, 50, 95]
+
+SETTINGS = {
+    'draws': 1000,
+    'seed': 0,
+    'horizon': BASE_SCENARIO['horizon'],
+    'memory_gb': memory_limit_gb,
+    'gdp_shock': None,
+    'pop_shock': None,
+    'elasticity': None,
+}
+
+
+######## Settings ########
+def load_settings(path=simulation_file) -> dict:
+    """Settings of ``path`` over :data:`SETTINGS`; a missing distribution means no uncertainty."""
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+
+    unknown = set(config) - set(SETTINGS)
+    if unknown:
+        raise ValueError(f'Unknown setting(s) {sorted(unknown)} in {path}, use {list(SETTINGS)}')
+    for name in ['gdp_shock', 'pop_shock', 'elasticity']:
+        distribution = (config.get(name) or {}).get('distribution', 'normal')
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}' for {name}, use one of {DISTRIBUTIONS}")
+    return {**SETTINGS, **config}
+
+
+def sample(spec, rng: np.random.Generator, size, center: float = 0.0) -> np.ndarray:
+    """Draws of ``spec`` ({'distribution', ...}); a normal without 'mean' is centred on ``center``."""
+    if spec is None:
+        return np.full(size, center)
+
+    distribution = spec.get('distribution', 'normal')
+    if distribution == 'normal':
+        return rng.normal(spec.get('mean', center), spec['sd'], size)
+    if distribution == 'uniform':
+        return rng.uniform(spec['low'], spec['high'], size)
+    return rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+
+
+######## Model arrays ########
+class Inputs(NamedTuple):
+    # Pairs (sh6, importer) of the EPI, sorted by product; a segment is the pairs of one product
+    sh6: np.ndarray
+    importer: np.ndarray
+    row: np.ndarray
+    col: np.ndarray
+    segment: np.ndarray
+    segment_starts: np.ndarray
+    weighted_imports: np.ndarray
+    # Products
+    proj_exports_sc: np.ndarray
+    world_exports: sparse.csr_matrix
+    # Importers
+    bilateral_exports: np.ndarray
+    imports: sparse.csr_matrix
+    importer_gdp: np.ndarray
+    importer_pop: np.ndarray
+    # Yearly growth (country x year) from START_YEAR to the horizon
+    gdp_growth: np.ndarray
+    pop_growth: np.ndarray
+
+
+def _growth_matrix(df_growth: pl.DataFrame, value: str, horizon: int) -> tuple:
+    df_growth = (
+        df_growth
+        .filter(pl.col('year').is_between(START_YEAR, horizon))
+        .with_columns(country('ISO'))
+        .filter(pl.col('ISO').is_not_null())
+        .pivot(on='year', index='ISO', values=value, sort_columns=True)
+        .sort('ISO')
+    )
+    return df_growth['ISO'].cast(pl.String).to_numpy(), df_growth.drop('ISO').to_numpy()
+
+
+def _positions(labels: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    # Position of every key in the sorted ``labels``, -1 when missing
+    if not len(labels):
+        return np.full(len(keys), -1)
+    positions = np.searchsorted(labels, keys).clip(0, len(labels) - 1)
+    return np.where(labels[positions] == keys, positions, -1)
+
+
+def build_inputs(df_epi: pl.DataFrame, df_supply: pl.DataFrame, df_demand: pl.DataFrame,
+                 df_exports: pl.DataFrame, df_bilateral_sh6: pl.DataFrame,
+                 df_gdp_growth: pl.DataFrame, df_pop: pl.DataFrame,
+                 horizon: int = BASE_SCENARIO['horizon']) -> Inputs:
+    """Arrays of the EPI model from the outputs of the pipeline.
+
+    ``df_epi`` (epi_scores.parquet) fixes the pairs; the others are
+    supply_potential_sc, demand_potential, comex_exps_weighted,
+    bilateral_exports_sh6 and the growth workbooks.
+    """
+    products = df_supply['sh6'].to_numpy()
+    product_order = np.argsort(products)
+    products = products[product_order]
+    proj_exports_sc = df_supply['proj_exports_sc_2027'].to_numpy()[product_order]
+
+    # Importers demanding any supplied product, as in the ease of trade of make_ease
+    df_imports = (
+        df_demand.select([pl.col('importer').cast(pl.String), 'sh6', 'weighted_imports'])
+        .filter(pl.col('sh6').is_in(products.tolist()) & pl.col('weighted_imports').is_not_null())
+    )
+    importers = np.unique(df_imports['importer'].to_numpy())
+
+    df_pairs = (
+        df_epi.select([pl.col('importer').cast(pl.String), 'sh6'])
+        .join(df_imports, on=['importer', 'sh6'], how='left')
+        .sort(['sh6', 'importer'])
+    )
+    row = np.searchsorted(products, df_pairs['sh6'].to_numpy())
+    col = np.searchsorted(importers, df_pairs['importer'].to_numpy())
+    segment = np.cumsum(np.r_[False, row[1:] != row[:-1]])
+
+    gdp_iso, gdp = _growth_matrix(gdp_growth(df_gdp_growth), 'gdp_growth', horizon)
+    pop_iso, pop = _growth_matrix(population_growth(df_pop), 'pop_growth', horizon)
+
+    # Weighted exports of every exporter with a GDP projection, product x exporter
+    df_world = (
+        df_exports.filter(pl.col('year') == df_exports['year'].max())
+        .select([pl.col('exporter').cast(pl.String), 'sh6', 'weighted_exports'])
+        .filter(pl.col('sh6').is_in(products.tolist()) & pl.col('weighted_exports').is_not_null())
+    )
+    exporter = _positions(gdp_iso, df_world['exporter'].to_numpy())
+    known = exporter >= 0
+    world_exports = sparse.csr_matrix(
+        (
+            df_world['weighted_exports'].to_numpy()[known],
+            (np.searchsorted(products, df_world['sh6'].to_numpy())[known], exporter[known])
+        ),
+        shape=(len(products), len(gdp_iso))
+    )
+
+    imports = sparse.csr_matrix(
+        (
+            df_imports['weighted_imports'].to_numpy(),
+            (np.searchsorted(importers, df_imports['importer'].to_numpy()),
+             np.searchsorted(products, df_imports['sh6'].to_numpy()))
+        ),
+        shape=(len(importers), len(products))
+    )
+
+    df_bilateral = (
+        df_bilateral_sh6.group_by(pl.col('importer').cast(pl.String))
+        .agg(pl.sum('bilateral_exports_sc_sh6'))
+    )
+    bilateral_exports = np.full(len(importers), np.nan)
+    position = _positions(importers, df_bilateral['importer'].to_numpy())
+    bilateral_exports[position[position >= 0]] = df_bilateral['bilateral_exports_sc_sh6'].to_numpy()[position >= 0]
+
+    return Inputs(
+        sh6=df_pairs['sh6'].to_numpy(),
+        importer=df_pairs['importer'].to_numpy(),
+        row=row,
+        col=col,
+        segment=segment,
+        segment_starts=np.flatnonzero(np.r_[True, row[1:] != row[:-1]]),
+        weighted_imports=df_pairs['weighted_imports'].fill_null(np.nan).to_numpy(),
+        proj_exports_sc=proj_exports_sc,
+        world_exports=world_exports,
+        bilateral_exports=bilateral_exports,
+        imports=imports,
+        importer_gdp=_positions(gdp_iso, importers),
+        importer_pop=_positions(pop_iso, importers),
+        gdp_growth=gdp,
+        pop_growth=pop,
+    )
+
+
+######## Simulation ########
+def _pick(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    # Columns ``positions`` of ``values`` (draws x countries), NaN where the position is -1
+    picked = values[:, positions.clip(0)]
+    picked[:, positions < 0] = np.nan
+    return picked
+
+
+def score(inputs: Inputs, gdp_shock: np.ndarray, pop_shock: np.ndarray,
+          elasticity: np.ndarray) -> tuple:
+    """EPI and its normalisation per product for a chunk of draws (draws x pairs).
+
+    ``gdp_shock`` and ``pop_shock`` (draws x countries x years) are added to
+    the yearly growth rates; ``elasticity`` has one value per draw.
+    """
+    gdp_index = np.prod(1 + (inputs.gdp_growth + gdp_shock), axis=2)
+    pop_index = np.prod(1 + (inputs.pop_growth + pop_shock), axis=2)
+
+    # Demand index of every importer, as in make_demand
+    importer_gdp = _pick(gdp_index, inputs.importer_gdp)
+    importer_pop = _pick(pop_index, inputs.importer_pop)
+    demand_index = (importer_gdp / importer_pop) ** elasticity[:, None] * importer_pop
+
+    # SC's share of the world projection, as in make_supply
+    world = (inputs.world_exports @ gdp_index.T).T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = inputs.proj_exports_sc / world
+
+        # Ease of trade, as in make_ease
+        ease = inputs.bilateral_exports / (inputs.imports @ share.T).T
+
+    projected = inputs.weighted_imports * demand_index[:, inputs.col]
+    epi = share[:, inputs.row] * projected * ease[:, inputs.col]
+
+    valid = ~np.isnan(epi)
+    lowest = np.minimum.reduceat(np.where(valid, epi, np.inf), inputs.segment_starts, axis=1)
+    highest = np.maximum.reduceat(np.where(valid, epi, -np.inf), inputs.segment_starts, axis=1)
+    low, high = lowest[:, inputs.segment], highest[:, inputs.segment]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        normalized = np.where(high != low, (epi - low) / (high - low), 0.0)
+    return epi, np.where(valid, normalized, np.nan)
+
+
+def rank(inputs: Inputs, normalized: np.ndarray) -> np.ndarray:
+    """Rank of every pair within its product in each draw (1 = highest EPI, NaN scores last)."""
+    # Pairs are sorted by product, so sorting segment + (1 - score) / 2 keeps the products apart
+    # and the i-th sorted pair belongs to the same product as the i-th pair
+    key = inputs.segment + np.where(np.isnan(normalized), 0.75, (1 - normalized.clip(0, 1)) / 2)
+    order = np.argsort(key, axis=1, kind='stable')
+    within = np.arange(len(inputs.row)) - inputs.segment_starts[inputs.segment]
+    ranks = np.empty(order.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, np.broadcast_to(within + 1, order.shape).astype(np.int32), axis=1)
+    return ranks
+
+
+def chunk_size(inputs: Inputs, draws: int, memory_gb: float) -> int:
+    """Draws scored at once so the chunk's arrays stay within ``memory_gb``."""
+    per_draw = 8 * (
+        12 * len(inputs.row)
+        + 3 * (inputs.gdp_growth.size + inputs.pop_growth.size)
+        + 4 * (len(inputs.proj_exports_sc) + len(inputs.bilateral_exports))
+    )
+    return int(max(1, min(draws, memory_gb * 1024 ** 3 // per_draw)))
+
+
+def simulate(inputs: Inputs, settings: dict) -> pl.DataFrame:
+    """Base EPI and p5/p50/p95 bands and rank stability of every pair over the draws of ``settings``."""
+    draws = settings['draws']
+    n_pairs = len(inputs.row)
+    n_gdp, n_years = inputs.gdp_growth.shape
+    n_pop = inputs.pop_growth.shape[0]
+
+    base_elasticity = BASE_SCENARIO['elasticity']
+    base_epi, base_normalized = score(
+        inputs, np.zeros((1, n_gdp, n_years)), np.zeros((1, n_pop, n_years)), np.array([base_elasticity])
+    )
+    base_rank = rank(inputs, base_normalized)[0]
+
+    simulation_scratch.mkdir(parents=True, exist_ok=True)
+    scores = np.lib.format.open_memmap(
+        simulation_scratch / 'epi.npy', mode='w+', dtype=np.float32, shape=(draws, n_pairs))
+    normalized_scores = np.lib.format.open_memmap(
+        simulation_scratch / 'epi_normalized.npy', mode='w+', dtype=np.float32, shape=(draws, n_pairs))
+    ranks = np.lib.format.open_memmap(
+        simulation_scratch / 'rank.npy', mode='w+', dtype=np.int32, shape=(draws, n_pairs))
+
+    size = chunk_size(inputs, draws, settings['memory_gb'])
+    for start in range(0, draws, size):
+        # One generator per draw, so the draws do not depend on the chunk size
+        samples = [
+            (
+                sample(settings['gdp_shock'], rng, (n_gdp, n_years)),
+                sample(settings['pop_shock'], rng, (n_pop, n_years)),
+                sample(settings['elasticity'], rng, (), center=base_elasticity),
+            )
+            for rng in (np.random.default_rng([settings['seed'], draw])
+                        for draw in range(start, min(start + size, draws)))
+        ]
+        gdp_shock, pop_shock, elasticity = (np.stack(values) for values in zip(*samples))
+        epi, normalized = score(inputs, gdp_shock, pop_shock, elasticity)
+
+        stop = start + len(samples)
+        scores[start:stop] = epi
+        normalized_scores[start:stop] = normalized
+        ranks[start:stop] = rank(inputs, normalized)
+
+    # Bands read back in blocks of pairs of about the size of a chunk of draws
+    block = int(max(1, size * n_pairs // draws))
+    columns = {}
+    for name, values in [('epi_score', scores), ('epi_score_normalized', normalized_scores), ('rank', ranks)]:
+        bands = np.empty((len(PERCENTILES), n_pairs))
+        for start in range(0, n_pairs, block):
+            bands[:, start:start + block] = np.nanpercentile(
+                values[:, start:start + block], PERCENTILES, axis=0)
+        for percentile, band in zip(PERCENTILES, bands):
+            columns[f'{name}_p{percentile}'] = band
+
+    stability = np.empty(n_pairs)
+    for start in range(0, n_pairs, block):
+        stability[start:start + block] = (ranks[:, start:start + block] == base_rank[start:start + block]).mean(axis=0)
+
+    del scores, normalized_scores, ranks
+    for path in simulation_scratch.glob('*.npy'):
+        path.unlink()
+
+    return pl.DataFrame({
+        'importer': inputs.importer,
+        'sh6': inputs.sh6,
+        'epi_score': base_epi[0],
+        'epi_score_normalized': base_normalized[0],
+        'rank': base_rank,
+        **columns,
+        'rank_stability': stability,
+    })
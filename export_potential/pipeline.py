@@ -0,0 +1,440 @@
+"""Dependency-aware runner for the pipeline stages.
+
+Each stage is one of the scripts in this package, declared in :data:`STAGES`
+with the files it reads and writes. A stage depends on the stages whose
+outputs it reads, so the order (BACI -> comex -> demand/supply -> ease ->
+model_epi -> analysis_epi/monte_carlo -> app_store, with epi_batch,
+scenarios and competitors alongside) follows from the declarations.
+
+A stage is skipped when the content hash of its inputs, code and settings
+matches the last successful run and its outputs still exist. Hashes are
+computed when a stage becomes ready, so a stage whose upstream reran but
+wrote identical files is skipped too. File digests are cached by size and
+modification time in data/interim/pipeline_state.json, so unchanged multi-GB
+inputs are not read again.
+
+Stages with no pending dependency run concurrently, each in its own Python
+process with ``POLARS_MAX_THREADS`` set to its share of the CPUs.
+
+Usage::
+
+    python -m export_potential.pipeline run               # everything
+    python -m export_potential.pipeline run ease --force  # ease and its upstream
+    python -m export_potential.pipeline list
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import List, NamedTuple, Optional
+
+import typer
+
+from export_potential.app_store import CURRENT, app_store
+from export_potential.baci import baci_dataset, baci_sources
+from export_potential.config import (
+    app_data,
+    data_interim,
+    data_processed,
+    data_raw,
+    project_root,
+    references,
+)
+from export_potential.profiling import file_bytes, parquet_rows, run_script, write_report
+
+package = Path(__file__).resolve().parent
+pipeline_state = data_interim / 'pipeline_state.json'
+
+# Library modules imported by the stages; editing one invalidates every stage
+SHARED_CODE = [
+    package / 'app_index.py',
+    package / 'app_store.py',
+    package / 'baci.py',
+    package / 'batch_epi.py',
+    package / 'clustering.py',
+    package / 'codes.py',
+    package / 'config.py',
+    package / 'formatting.py',
+    package / 'growth.py',
+    package / 'macro.py',
+    package / 'monte_carlo.py',
+    package / 'reference_data.py',
+    package / 'scenarios.py',
+    package / 'weighting.py',
+]
+
+# Reference tables read through export_potential.codes by every stage that encodes its outputs
+COUNTRY_CODES = [references / 'countries.csv', references / 'countries_br.csv']
+
+# State share workbooks read by the batch EPI (share_sc.xlsx and any other share_<uf>.xlsx)
+UNIT_SHARES = sorted(references.glob('share_*.xlsx'))
+
+
+class Stage(NamedTuple):
+    script: Path
+    inputs: list
+    outputs: list
+    # Environment settings read by the script (see export_potential.config)
+    settings: tuple = ()
+    # Files read when they exist; no stage writes them, and they are hashed like the inputs
+    optional_inputs: tuple = ()
+
+
+######## Stage declarations ########
+STAGES = {
+    'baci': Stage(
+        script=package / 'make_baci.py',
+        inputs=[data_raw],
+        outputs=[baci_dataset, baci_sources],
+    ),
+    'comex': Stage(
+        script=package / 'make_comex.py',
+        inputs=[baci_dataset, references / 'products.csv', *COUNTRY_CODES],
+        outputs=[
+            data_interim / 'comex_exps_weighted.parquet',
+            data_interim / 'comex_imps_weighted.parquet',
+        ],
+    ),
+    'demand': Stage(
+        script=package / 'make_demand.py',
+        inputs=[
+            data_interim / 'comex_imps_weighted.parquet',
+            references / 'pop_growth.xlsx',
+            references / 'gdp_growth.xlsx',
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'demand_potential.parquet'],
+    ),
+    'supply': Stage(
+        script=package / 'make_supply.py',
+        inputs=[
+            data_interim / 'comex_exps_weighted.parquet',
+            references / 'share_sc.xlsx',
+            references / 'gdp_growth.xlsx',
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'supply_potential_sc.parquet'],
+    ),
+    'ease': Stage(
+        script=package / 'make_ease.py',
+        inputs=[
+            baci_dataset,
+            data_processed / 'demand_potential.parquet',
+            data_processed / 'supply_potential_sc.parquet',
+            references / 'share_sc.xlsx',
+            references / 'products.csv',
+            *COUNTRY_CODES,
+        ],
+        outputs=[
+            data_interim / 'bilateral_exports_sh6.parquet',
+            data_processed / 'ease_of_trade.parquet',
+        ],
+    ),
+    'model_epi': Stage(
+        script=package / 'modeling' / 'model_epi.py',
+        inputs=[
+            data_processed / 'ease_of_trade.parquet',
+            data_processed / 'demand_potential.parquet',
+            data_processed / 'supply_potential_sc.parquet',
+            data_interim / 'bilateral_exports_sh6.parquet',
+            references / 'products_br_mdic.xlsx',
+            references / 'sh6_mundo_comp.xlsx',
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'epi_scores.parquet'],
+    ),
+    'analysis_epi': Stage(
+        script=package / 'modeling' / 'analysis_epi.py',
+        inputs=[data_processed / 'epi_scores.parquet', *COUNTRY_CODES],
+        outputs=[
+            app_data / 'epi_scores_sh6.parquet',
+            app_data / 'epi_scores_countries.parquet',
+            app_data / 'epi_scores.parquet',
+            app_data / 'epi_scores_sc_comp.parquet',
+        ],
+        settings=('EXPORT_POTENTIAL_CLUSTER_METHOD',),
+    ),
+    'monte_carlo': Stage(
+        script=package / 'modeling' / 'model_monte_carlo.py',
+        inputs=[
+            data_processed / 'epi_scores.parquet',
+            data_processed / 'supply_potential_sc.parquet',
+            data_processed / 'demand_potential.parquet',
+            data_interim / 'comex_exps_weighted.parquet',
+            data_interim / 'bilateral_exports_sh6.parquet',
+            references / 'monte_carlo.toml',
+            references / 'gdp_growth.xlsx',
+            references / 'pop_growth.xlsx',
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'epi_monte_carlo.parquet'],
+    ),
+    'epi_batch': Stage(
+        script=package / 'modeling' / 'model_epi_batch.py',
+        inputs=[
+            baci_dataset,
+            data_interim / 'comex_exps_weighted.parquet',
+            data_processed / 'demand_potential.parquet',
+            references / 'gdp_growth.xlsx',
+            references / 'products.csv',
+            *UNIT_SHARES,
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'epi_scores_batch.parquet'],
+        settings=('EXPORT_POTENTIAL_UNITS',),
+    ),
+    'scenarios': Stage(
+        script=package / 'modeling' / 'model_scenarios.py',
+        inputs=[
+            baci_dataset,
+            data_interim / 'comex_exps_weighted.parquet',
+            data_interim / 'comex_imps_weighted.parquet',
+            references / 'scenarios.toml',
+            references / 'gdp_growth.xlsx',
+            references / 'pop_growth.xlsx',
+            references / 'products.csv',
+            *UNIT_SHARES,
+            *COUNTRY_CODES,
+        ],
+        outputs=[data_processed / 'epi_scenarios'],
+    ),
+    'competitors': Stage(
+        script=package / 'make_competitors.py',
+        inputs=[
+            baci_dataset,
+            references / 'share_sc.xlsx',
+            references / 'products_br_mdic.xlsx',
+            references / 'products.csv',
+            *COUNTRY_CODES,
+        ],
+        outputs=[app_data / 'df_competitors.parquet'],
+        settings=('EXPORT_POTENTIAL_CAGR_METHOD',),
+    ),
+    'app_store': Stage(
+        script=package / 'make_app_store.py',
+        inputs=[
+            app_data / 'epi_scores_sh6.parquet',
+            app_data / 'epi_scores_countries.parquet',
+            app_data / 'epi_scores_sc_comp.parquet',
+            app_data / 'df_competitors.parquet',
+            references / 'munic_vp.xlsx',
+        ],
+        outputs=[app_store / CURRENT],
+        # Committed app tables; make_app_store publishes without the missing ones
+        optional_inputs=(
+            app_data / 'df_tariff_brazil.parquet',
+            app_data / 'epi_scores_processed.parquet',
+            app_data / 'app_dataset_processed.parquet',
+        ),
+    ),
+}
+
+
+def _contains(parent: Path, path: Path) -> bool:
+    return path == parent or parent in path.parents
+
+
+def dependencies(name: str) -> list:
+    """Stages that write one of the inputs of ``name``."""
+    inputs = STAGES[name].inputs
+    return [
+        other for other, stage in STAGES.items()
+        if other != name
+        and any(_contains(output, path) for output in stage.outputs for path in inputs)
+    ]
+
+
+def upstream(names) -> list:
+    """``names`` and everything they depend on, in declaration order."""
+    selected, pending = set(), list(names)
+    while pending:
+        name = pending.pop()
+        if name not in selected:
+            selected.add(name)
+            pending.extend(dependencies(name))
+    return [name for name in STAGES if name in selected]
+
+
+######## Content hashes ########
+def _load_state() -> dict:
+    if pipeline_state.exists():
+        return json.loads(pipeline_state.read_text())
+    return {'files': {}, 'stages': {}}
+
+
+def _save_state(state: dict) -> None:
+    pipeline_state.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pipeline_state.with_suffix('.json.tmp')
+    tmp.write_text(json.dumps(state, indent=2))
+    tmp.replace(pipeline_state)
+
+
+def _file_digest(path: Path, files: dict) -> str:
+    """SHA-256 of ``path``, reused from ``files`` while its size and mtime are unchanged."""
+    stat = path.stat()
+    key = str(path.relative_to(project_root))
+    entry = files.get(key)
+    if entry and entry['size'] == stat.st_size and entry['mtime_ns'] == stat.st_mtime_ns:
+        return entry['sha256']
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+
+    files[key] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': digest.hexdigest()}
+    return files[key]['sha256']
+
+
+def stage_hash(name: str, files: dict) -> str:
+    """Hash of the code, of every input file and of the settings of a stage."""
+    stage = STAGES[name]
+    paths = []
+    for path in [stage.script, *SHARED_CODE, *stage.inputs, *stage.optional_inputs]:
+        if path.is_dir():
+            paths.extend(sorted(p for p in path.rglob('*') if p.is_file()))
+        else:
+            paths.append(path)
+
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(str(path.relative_to(project_root)).encode())
+        digest.update(_file_digest(path, files).encode() if path.exists() else b'missing')
+    for setting in stage.settings:
+        digest.update(f'{setting}={os.getenv(setting, "")}'.encode())
+    return digest.hexdigest()
+
+
+def is_current(name: str, state: dict) -> bool:
+    """Whether the last successful run of ``name`` used the same inputs and its outputs exist."""
+    stage = STAGES[name]
+    return (
+        state['stages'].get(name) == stage_hash(name, state['files'])
+        and all(path.exists() for path in stage.outputs)
+    )
+
+
+######## Execution ########
+def run_stage(name: str, threads: int) -> dict:
+    """Run a stage script in a fresh interpreter with ``threads`` polars threads.
+
+    Returns the exit code and resource usage from :func:`profiling.run_script`.
+    """
+    env = {**os.environ, 'POLARS_MAX_THREADS': str(threads)}
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(project_root), env.get('PYTHONPATH')]))
+    return run_script(STAGES[name].script, env)
+
+
+def run_pipeline(names=None, force: bool = False, jobs: int = 2,
+                 threads: Optional[int] = None) -> dict:
+    """Run ``names`` (default: every stage) and their upstream stages.
+
+    Up to ``jobs`` independent stages run at once, each limited to
+    ``threads`` polars threads (default: the CPUs split evenly between the
+    jobs). Returns the status of each stage: 'ran', 'skipped', 'failed' or
+    'blocked' (an upstream stage failed).
+
+    Every run writes a report with the resources and row counts of each
+    stage to reports/pipeline/ (see :mod:`export_potential.profiling`).
+    """
+    selected = upstream(names or list(STAGES))
+    threads = threads or max(1, (os.cpu_count() or 1) // jobs)
+    state = _load_state()
+    status = {}
+    running = {}
+    records = []
+    run_id = time.strftime('%Y%m%dT%H%M%S')
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        while len(status) < len(selected):
+            settled = len(status)
+            for name in selected:
+                if name in status or name in running.values():
+                    continue
+                deps = [dep for dep in dependencies(name) if dep in selected]
+                if any(status.get(dep) in ('failed', 'blocked') for dep in deps):
+                    status[name] = 'blocked'
+                    records.append({'stage': name, 'status': 'blocked'})
+                    print(f'[{name}] blocked by a failed upstream stage')
+                elif all(dep in status for dep in deps):
+                    if not force and is_current(name, state):
+                        status[name] = 'skipped'
+                        records.append({'stage': name, 'status': 'skipped'})
+                        print(f'[{name}] up to date, skipped')
+                    else:
+                        print(f'[{name}] running with {threads} thread(s)')
+                        running[pool.submit(run_stage, name, threads)] = name
+
+            if not running:
+                if len(status) == settled:
+                    # Nothing ran, settled or is running: the remaining stages wait on each other
+                    waiting = [name for name in selected if name not in status]
+                    raise RuntimeError(f'Stages {waiting} cannot be scheduled, check their dependencies')
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                usage = future.result()
+                returncode = usage.pop('returncode')
+                stage = STAGES[name]
+                if returncode == 0:
+                    status[name] = 'ran'
+                    state['stages'][name] = stage_hash(name, state['files'])
+                    print(f'[{name}] done in {usage["wall_s"]:.1f}s, '
+                          f'peak RSS {usage["peak_rss_mb"]:.0f} MB')
+                else:
+                    status[name] = 'failed'
+                    state['stages'].pop(name, None)
+                    print(f'[{name}] failed with exit code {returncode}')
+                _save_state(state)
+                records.append({
+                    'stage': name,
+                    'status': status[name],
+                    'threads': threads,
+                    **usage,
+                    'rows_in': parquet_rows(stage.inputs),
+                    'rows_out': parquet_rows(stage.outputs),
+                    'output_bytes': file_bytes(stage.outputs),
+                })
+
+    print(f'Run report written to {write_report(run_id, records)}')
+    return status
+
+
+######## CLI ########
+cli = typer.Typer(help='Run the export potential pipeline.')
+
+
+@cli.command()
+def run(
+    stages: Optional[List[str]] = typer.Argument(None, help='Stages to run, with their upstream.'),
+    force: bool = typer.Option(False, help='Run the stages even if their inputs are unchanged.'),
+    jobs: int = typer.Option(2, help='Stages run concurrently.'),
+    threads: Optional[int] = typer.Option(None, help='Polars threads per stage.'),
+):
+    """Run the pipeline, skipping stages whose inputs are unchanged."""
+    unknown = [name for name in stages or [] if name not in STAGES]
+    if unknown:
+        raise typer.BadParameter(f"Unknown stage(s) {unknown}, choose from {list(STAGES)}")
+
+    status = run_pipeline(stages, force=force, jobs=jobs, threads=threads)
+    if any(value in ('failed', 'blocked') for value in status.values()):
+        raise typer.Exit(code=1)
+
+
+@cli.command('list')
+def list_stages():
+    """Show the stages, their dependencies and whether they are up to date."""
+    state = _load_state()
+    for name in STAGES:
+        current = 'up to date' if is_current(name, state) else 'pending'
+        deps = ', '.join(dependencies(name)) or '-'
+        print(f'{name:<14} {current:<11} after: {deps}')
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,98 @@
+"""Resource usage of pipeline stages and the run reports built from it.
+
+:func:`run_script` runs a stage in a child process and reads the child's
+own rusage when it exits, so wall time, CPU time and peak RSS are exact even
+when several stages run at once. :func:`write_report` stores one run as
+reports/pipeline/<run_id>.json and appends its rows to
+reports/pipeline/history.csv, which keeps every run for comparison.
+"""
+
+import csv
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import polars as pl
+
+from export_potential.config import project_root, reports
+
+pipeline_reports = reports / 'pipeline'
+
+REPORT_COLUMNS = [
+    'run_id',
+    'stage',
+    'status',
+    'threads',
+    'wall_s',
+    'cpu_user_s',
+    'cpu_system_s',
+    'peak_rss_mb',
+    'rows_in',
+    'rows_out',
+    'output_bytes',
+]
+
+
+def run_script(script: Path, env: dict) -> dict:
+    """Run ``script`` with ``env`` and return its exit code and resource usage."""
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, str(script)], cwd=project_root, env=env)
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+
+    return {
+        'returncode': process.returncode,
+        'wall_s': round(time.perf_counter() - start, 3),
+        'cpu_user_s': round(usage.ru_utime, 3),
+        'cpu_system_s': round(usage.ru_stime, 3),
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(usage.ru_maxrss / 1024, 1),
+    }
+
+
+def _files(paths) -> list:
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(sorted(p for p in path.rglob('*') if p.is_file()))
+        elif path.exists():
+            files.append(path)
+    return files
+
+
+def parquet_rows(paths):
+    """Total rows of the Parquet files in ``paths``, read from their metadata.
+
+    Other formats are not counted; returns None when there is no Parquet file.
+    """
+    files = [f for f in _files(paths) if f.suffix == '.parquet']
+    if not files:
+        return None
+    return sum(pl.scan_parquet(f).select(pl.len()).collect().item() for f in files)
+
+
+def file_bytes(paths) -> int:
+    """Total size on disk of ``paths``, directories included."""
+    return sum(f.stat().st_size for f in _files(paths))
+
+
+def write_report(run_id: str, records: list) -> Path:
+    """Write a run's stage records as JSON and append them to the CSV history."""
+    pipeline_reports.mkdir(parents=True, exist_ok=True)
+
+    rows = [{'run_id': run_id, **record} for record in records]
+    path = pipeline_reports / f'{run_id}.json'
+    path.write_text(json.dumps(rows, indent=2))
+
+    history = pipeline_reports / 'history.csv'
+    new = not history.exists()
+    with open(history, 'a', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=REPORT_COLUMNS, extrasaction='ignore')
+        if new:
+            writer.writeheader()
+        writer.writerows(rows)
+
+    return path
@@ -0,0 +1,41 @@
+"""Reference workbooks read through a typed Parquet cache.
+
+Parsing the Excel files in references/ is slow compared to reading Parquet,
+and several stages (and the app) read the same workbooks. The first call of
+:func:`read_reference` converts a workbook into data/interim/references/;
+later calls read the cache until the workbook's size or modification time
+changes.
+"""
+
+import os
+
+import polars as pl
+
+from export_potential.config import data_interim, references
+
+reference_cache = data_interim / 'references'
+
+
+def read_reference(name: str) -> pl.DataFrame:
+    """Contents of ``references/<name>.xlsx``, from the cache when it is current."""
+    source = references / f'{name}.xlsx'
+    stat = source.stat()
+
+    # The source size and mtime are part of the file name, so a changed
+    # workbook simply misses the cache
+    cache = reference_cache / f'{name}-{stat.st_size}-{stat.st_mtime_ns}.parquet'
+    if cache.exists():
+        return pl.read_parquet(cache)
+
+    df = pl.read_excel(source)
+
+    reference_cache.mkdir(parents=True, exist_ok=True)
+    tmp = cache.with_suffix(f'.{os.getpid()}.tmp')
+    df.write_parquet(tmp)
+    tmp.replace(cache)
+
+    for stale in reference_cache.glob(f'{name}-*.parquet'):
+        if stale != cache:
+            stale.unlink(missing_ok=True)
+
+    return df
@@ -0,0 +1,151 @@
+"""Macro scenarios evaluated in one pass, with the scenario as one more key.
+
+make_demand and make_supply project to 2027 with the income elasticity and
+the accumulated growth of Santa Catarina's exports of :mod:`macro`. A
+scenario in ``references/scenarios.toml`` overrides any of these and shifts
+the GDP and population growth paths::
+
+    [[scenario]]
+    name = 'low_growth'
+    gdp_shift = -0.01      # one point less of GDP growth every year
+    acc_growth_gdp = 1.15
+
+Every scenario is crossed with the yearly growth rates of :mod:`macro`, so
+the GDP, population and demand indexes of all scenarios come out of one
+cumulative product, and the supply, ease of trade and EPI of :mod:`batch_epi` are
+computed with 'scenario' among their keys.
+"""
+
+try:
+    import tomllib
+except ModuleNotFoundError:
+    import tomli as tomllib
+
+import polars as pl
+
+from export_potential.codes import country
+from export_potential.config import references
+from export_potential.macro import (
+    ACC_GROWTH_GDP,
+    ELASTICITY,
+    START_YEAR,
+    cumulative_index,
+    demand_index,
+    gdp_growth,
+    population_growth,
+)
+
+scenario_file = references / 'scenarios.toml'
+
+# Parameters of make_demand and make_supply, used where a scenario leaves them out
+BASE_SCENARIO = {
+    'horizon': 2027,
+    'elasticity': ELASTICITY,
+    'acc_growth_gdp': ACC_GROWTH_GDP,
+    'gdp_shift': 0.0,
+    'pop_shift': 0.0,
+}
+
+SCENARIO_SCHEMA = {
+    'scenario': pl.String,
+    'horizon': pl.Int64,
+    'elasticity': pl.Float64,
+    'acc_growth_gdp': pl.Float64,
+    'gdp_shift': pl.Float64,
+    'pop_shift': pl.Float64,
+}
+
+
+######## Scenarios ########
+def load_scenarios(path=scenario_file) -> pl.DataFrame:
+    """One row per ``[[scenario]]`` of ``path``, with the parameters of :data:`BASE_SCENARIO` as defaults."""
+    with open(path, 'rb') as f:
+        config = tomllib.load(f)
+
+    rows = []
+    for entry in config.get('scenario', []):
+        entry = dict(entry)
+        name = entry.pop('name', None)
+        if name is None:
+            raise ValueError(f'Every scenario in {path} needs a name')
+        unknown = set(entry) - set(BASE_SCENARIO)
+        if unknown:
+            raise ValueError(f"Unknown parameter(s) {sorted(unknown)} in scenario '{name}', "
+                             f'use {list(BASE_SCENARIO)}')
+        rows.append({'scenario': name, **BASE_SCENARIO, **entry})
+
+    names = [row['scenario'] for row in rows]
+    if not names:
+        raise ValueError(f'No scenario in {path}')
+    if len(set(names)) < len(names):
+        raise ValueError(f'Repeated scenario names in {path}')
+
+    return pl.DataFrame(rows, schema=SCENARIO_SCHEMA)
+
+
+######## Growth paths ########
+def accumulate(df_growth: pl.DataFrame, df_scenarios: pl.DataFrame, growth: str, shift: str,
+               alias: str) -> pl.DataFrame:
+    """Growth accumulated from :data:`START_YEAR` to each scenario's horizon (scenario, ISO, ``alias``).
+
+    ``growth`` is shifted by the scenario's ``shift`` every year. A country
+    missing the growth of any year in the window gets a null index.
+    """
+    last_year = df_growth['year'].max()
+    beyond = df_scenarios.filter(pl.col('horizon') > last_year)
+    if not beyond.is_empty():
+        raise ValueError(f"Scenario(s) {beyond['scenario'].to_list()} go beyond {last_year}, "
+                         f"the last year of '{growth}'")
+
+    df_growth = (
+        df_growth
+        .join(df_scenarios.select(['scenario', shift]), how='cross')
+        .with_columns((pl.col(growth) + pl.col(shift)).alias(growth))
+    )
+    return (
+        cumulative_index(df_growth, growth, alias, df_scenarios['horizon'].unique().sort(),
+                         by=['scenario', 'ISO'])
+        .join(df_scenarios.select(['scenario', 'horizon']), on=['scenario', 'horizon'])
+        .select(['scenario', 'ISO', alias])
+    )
+
+
+def macro_indexes(df_scenarios: pl.DataFrame, df_gdp_growth: pl.DataFrame,
+                  df_pop: pl.DataFrame) -> tuple:
+    """GDP index of every country (scenario, ISO, gdp_index) and demand index
+    of the countries with GDP and population (scenario, ISO, demand_index).
+
+    The demand index is the population index times the per capita GDP index
+    raised to the scenario's income elasticity, as in make_demand.
+    """
+    df_gdp_index = accumulate(gdp_growth(df_gdp_growth), df_scenarios, 'gdp_growth', 'gdp_shift', 'gdp_index')
+    df_pop_index = accumulate(population_growth(df_pop), df_scenarios, 'pop_growth', 'pop_shift', 'pop_index')
+
+    df_demand_index = (
+        df_gdp_index
+        .join(df_pop_index, on=['scenario', 'ISO'], how='inner')
+        .join(df_scenarios.select(['scenario', 'elasticity']), on='scenario')
+        .with_columns(
+            demand_index('elasticity').alias('demand_index')
+        )
+        .select(['scenario', country('ISO'), 'demand_index'])
+    )
+
+    return df_gdp_index.with_columns(country('ISO')), df_demand_index
+
+
+######## Demand ########
+def project_demand(df_imports: pl.DataFrame, df_scenarios: pl.DataFrame,
+                   df_demand_index: pl.DataFrame) -> pl.DataFrame:
+    """Imports of the last year (importer, sh6, weighted_imports) projected under every scenario."""
+    return (
+        df_imports.select(['importer', 'sh6', 'weighted_imports'])
+        .join(df_scenarios.select('scenario'), how='cross')
+        .join(
+            df_demand_index.rename({'ISO': 'importer'}),
+            on=['scenario', 'importer'],
+            how='left'
+        )
+        .with_columns((pl.col('weighted_imports') * pl.col('demand_index')).alias('projected_import_value'))
+        .select(['scenario', 'importer', 'sh6', 'weighted_imports', 'demand_index', 'projected_import_value'])
+    )
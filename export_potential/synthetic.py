@@ -0,0 +1,140 @@
+"""Synthetic BACI-shaped trade data for benchmarks.
+
+The real BACI dump is not shipped with the repository, so performance work
+needs data that looks like it. :func:`generate_baci` writes one CSV per year
+with the raw BACI columns (t, i, j, k, v, q) and:
+
+- exporters, importers and products drawn from the code spaces of
+  references/countries.csv and references/products.csv;
+- heavy-tailed activity: country and product weights follow a Pareto law,
+  so a few large economies and products account for most flows and most
+  (exporter, importer, product) combinations never trade;
+- log-normal values in thousands of US$ and quantities correlated with the
+  value, with the padded 'NA' BACI uses for missing quantities.
+
+The files go to data/interim/synthetic by default, never to data/raw:
+the baci stage converts every CSV there into the real dataset. Usage::
+
+    python -m export_potential.synthetic 10M --output data/interim/synthetic
+"""
+
+from pathlib import Path
+
+import numpy as np
+import polars as pl
+import typer
+
+from export_potential.config import data_interim, references
+
+synthetic_raw = data_interim / 'synthetic'
+
+# Rows generated and written at a time, to bound memory at large scales
+CHUNK_ROWS = 5_000_000
+
+# Share of flows without a reported quantity
+MISSING_QUANTITY = 0.05
+
+SCALE_SUFFIXES = {'K': 10 ** 3, 'M': 10 ** 6, 'B': 10 ** 9}
+
+
+def parse_scale(scale: str) -> int:
+    """Number of rows of a scale such as '1M', '250K' or '1000000'."""
+    scale = scale.strip().upper()
+    if scale[-1] in SCALE_SUFFIXES:
+        return int(float(scale[:-1]) * SCALE_SUFFIXES[scale[-1]])
+    return int(scale)
+
+
+def _pareto_weights(n: int, rng: np.random.Generator, shape: float = 1.2) -> np.ndarray:
+    weights = rng.pareto(shape, n) + 1
+    return weights / weights.sum()
+
+
+def _chunk(rows: int, year: int, countries: np.ndarray, country_weights: np.ndarray,
+           products: np.ndarray, product_weights: np.ndarray,
+           rng: np.random.Generator) -> pl.DataFrame:
+    exporters = rng.choice(countries, rows, p=country_weights)
+    importers = rng.choice(countries, rows, p=country_weights)
+    sh6 = rng.choice(products, rows, p=product_weights)
+
+    # Values in thousands of US$, heavy-tailed, with BACI's three decimals
+    value = np.maximum(np.round(rng.lognormal(2.0, 2.5, rows), 3), 0.001)
+    quantity = np.round(value * rng.lognormal(0.0, 1.5, rows), 3)
+
+    return (
+        pl.DataFrame({
+            't': np.full(rows, year, dtype=np.int16),
+            'i': exporters,
+            'j': importers,
+            'k': sh6,
+            'v': value,
+            'q': quantity,
+            'missing': rng.random(rows) < MISSING_QUANTITY,
+        })
+        .filter(pl.col('i') != pl.col('j'))
+        .unique(['i', 'j', 'k'], keep='first', maintain_order=True)
+        .with_columns([
+            pl.col('k').cast(pl.String).str.zfill(6),
+            pl.when(pl.col('missing'))
+            .then(pl.lit('NA').str.pad_start(15))
+            .otherwise(pl.col('q').cast(pl.String))
+            .alias('q'),
+        ])
+        .drop('missing')
+    )
+
+
+def generate_baci(rows: int, output: Path, years=range(2019, 2024),
+                  seed: int = 0) -> list:
+    """Write about ``rows`` synthetic BACI flows, split evenly across ``years``.
+
+    Repeated (exporter, importer, product) draws within a chunk are dropped,
+    as in BACI, so the files hold slightly fewer rows than requested.
+    Returns the files written.
+    """
+    rng = np.random.default_rng(seed)
+    output.mkdir(parents=True, exist_ok=True)
+
+    countries = pl.read_csv(references / 'countries.csv')['country_code'].to_numpy()
+    products = pl.read_csv(
+        references / 'products.csv', schema_overrides={'code': pl.Int32}
+    )['code'].to_numpy()
+    country_weights = _pareto_weights(len(countries), rng)
+    product_base = _pareto_weights(len(products), rng)
+
+    files = []
+    years = list(years)
+    for n, year in enumerate(years):
+        # Product popularity shifts a little from year to year
+        product_weights = product_base * rng.lognormal(0.0, 0.1, len(products))
+        product_weights /= product_weights.sum()
+        year_rows = rows // len(years) + (n < rows % len(years))
+
+        path = output / f'BACI_SYNTH_Y{year}_V{seed}.csv'
+        with open(path, 'wb') as f:
+            for start in range(0, year_rows, CHUNK_ROWS):
+                df = _chunk(
+                    min(CHUNK_ROWS, year_rows - start), year, countries, country_weights,
+                    products, product_weights, rng
+                )
+                df.write_csv(f, include_header=start == 0)
+        files.append(path)
+
+    return files
+
+
+def main(
+    scale: str = typer.Argument(..., help='Rows to generate, e.g. 1M, 10M or 100M.'),
+    output: Path = typer.Option(synthetic_raw, help='Directory for the CSV files.'),
+    first_year: int = typer.Option(2019, help='First year generated.'),
+    last_year: int = typer.Option(2023, help='Last year generated.'),
+    seed: int = typer.Option(0, help='Random seed.'),
+):
+    """Generate synthetic BACI CSV files."""
+    files = generate_baci(parse_scale(scale), output, range(first_year, last_year + 1), seed)
+    for path in files:
+        print(path)
+
+
+if __name__ == '__main__':
+    typer.run(main)
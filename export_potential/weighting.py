@@ -0,0 +1,76 @@
+"""Weighted moving averages over a window of years.
+
+The pipeline smooths trade flows with a weighted average of the last years,
+giving more weight to the most recent ones (0.2, 0.4, 0.6, 0.8 and 1.0 over
+five years). :func:`weighted_average` generalises it to any window length
+and decay, and computes it for several base years in one grouped pass by
+joining the data against a table of (base_year, year, weight).
+"""
+
+import polars as pl
+
+# Values and weights are summed as decimals, so the averages are exact and
+# do not depend on the order rows reach the aggregation
+DECIMAL = pl.Decimal(38, 9)
+
+
+def window_weights(base_years, window: int = 5, decay: str = 'linear',
+                   rate: float = 0.5) -> pl.DataFrame:
+    """Weights of each year in the window ending at every base year.
+
+    ``decay='linear'`` gives (window - lag) / window to a year ``lag`` years
+    before the base year; ``decay='exponential'`` gives ``rate ** lag``.
+    """
+    if decay == 'linear':
+        weights = [(window - lag) / window for lag in range(window)]
+    elif decay == 'exponential':
+        weights = [rate ** lag for lag in range(window)]
+    else:
+        raise ValueError(f"Unknown decay '{decay}', use 'linear' or 'exponential'")
+
+    return pl.DataFrame(
+        [
+            {'base_year': base_year, 'year': base_year - lag, 'weight': weight}
+            for base_year in base_years
+            for lag, weight in enumerate(weights)
+        ],
+        schema={'base_year': pl.Int64, 'year': pl.Int64, 'weight': pl.Float64}
+    )
+
+
+def weighted_average(df, by: list, value: str, alias: str, base_years=None,
+                     window: int = 5, decay: str = 'linear',
+                     rate: float = 0.5) -> pl.LazyFrame:
+    """Weighted average of ``value`` by ``by`` over the window ending at each base year.
+
+    ``df`` needs a 'year' column. ``base_years`` defaults to every year in
+    ``df``, which yields the full historical series. Years missing from the
+    data are left out of both the weighted sum and the sum of weights.
+    Returns 'base_year', the ``by`` columns and ``alias``.
+    """
+    df = df.lazy()
+
+    if base_years is None:
+        base_years = df.select(pl.col('year').unique()).collect().to_series().to_list()
+
+    weights = window_weights(base_years, window=window, decay=decay, rate=rate)
+
+    return (
+        df
+        .with_columns(pl.col('year').cast(pl.Int64))
+        .join(weights.lazy(), on='year', how='inner')
+        .with_columns([
+            pl.col(value).cast(DECIMAL),
+            pl.col('weight').cast(DECIMAL)
+        ])
+        .with_columns([
+            (pl.col(value) * pl.col('weight')).alias('weighted_value')
+        ])
+        .group_by(['base_year', *by])
+        .agg([
+            (
+                pl.sum('weighted_value').cast(pl.Float64)
+                / pl.sum('weight').cast(pl.Float64)
+            ).alias(alias)
+        ])
+    )
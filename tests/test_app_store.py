@@ -0,0 +1,34 @@
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from export_potential.app_store import current_version, publish, read_manifest, read_table
+
+
+def table() -> pl.DataFrame:
+    return pl.DataFrame({
+        'sh6_product': ['020714 - Pedaços de galos', '440710 - Madeira de coníferas', None],
+        'importer': pl.Series(['ARG', 'CHL', 'ARG'], dtype=pl.Enum(['ARG', 'CHL'])),
+        'value': [1.5, 2.0, None],
+        'year': pl.Series([2023, 2023, 2022], dtype=pl.Int16),
+    })
+
+
+def test_string_columns_read_back_from_the_store(tmp_path):
+    df = table()
+    version = publish({'markets': df}, store=tmp_path)
+
+    assert current_version(tmp_path) == version
+    assert_frame_equal(read_table('markets', store=tmp_path), df)
+    assert_frame_equal(
+        read_table('markets', columns=['sh6_product', 'value'], store=tmp_path),
+        df.select(['sh6_product', 'value']),
+    )
+
+
+def test_unchanged_publish_keeps_the_version(tmp_path):
+    version = publish({'markets': table()}, store=tmp_path)
+    assert publish({'markets': table()}, store=tmp_path) == version
+
+    changed = publish({'markets': table().with_columns(pl.col('value') * 2)}, store=tmp_path)
+    assert changed != version
+    assert read_manifest(tmp_path)['tables']['markets']['rows'] == 3
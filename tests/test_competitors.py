@@ -0,0 +1,83 @@
+import polars as pl
+from polars.testing import assert_frame_equal
+
+from export_potential.codes import country, country_names
+from export_potential.config import references
+from export_potential.growth import cagr
+
+KEYS = ['exporter', 'importer', 'sh6']
+
+
+def panel() -> pl.DataFrame:
+    """Small BACI-like panel: gaps in the years, a repeated ISO code (GGY) and a zero start."""
+    return pl.DataFrame({
+        'year': [2019, 2021, 2023, 2019, 2023, 2020, 2023, 2019, 2023, 2019, 2019, 2023],
+        'exporter': ['BRA', 'BRA', 'BRA', 'CHN', 'CHN', 'BRA', 'BRA', 'USA', 'USA', 'BRA', 'BRA', 'BRA'],
+        'importer': ['ARG', 'ARG', 'ARG', 'ARG', 'ARG', 'GGY', 'GGY', 'GGY', 'GGY', 'CHL', 'CHL', 'CHL'],
+        'sh6': [20714, 20714, 20714, 20714, 20714, 20714, 20714, 20714, 20714, 440710, 440710, 440710],
+        'value': [100.0, 150.0, 300.0, 50.0, 40.0, 10.0, 20.0, 5.0, 15.0, 0.0, 0.0, 8.0],
+    }).with_columns(country('exporter'), country('importer'), pl.col('sh6').cast(pl.Int32))
+
+
+def baseline_cagr(df: pl.DataFrame) -> pl.DataFrame:
+    # CAGR of make_competitors before growth.cagr (filter on the first and last years of each group)
+    return (
+        df.group_by(KEYS)
+        .agg([
+            pl.col('year').min().alias('min_year'),
+            pl.col('year').max().alias('max_year'),
+            pl.col('value').filter(pl.col('year') == pl.col('year').min()).sum().alias('start_value'),
+            pl.col('value').filter(pl.col('year') == pl.col('year').max()).sum().alias('end_value'),
+        ])
+        .select([
+            *KEYS,
+            (((pl.col('end_value') / pl.col('start_value'))
+              ** (1 / (pl.col('max_year') - pl.col('min_year'))) - 1) * 100).alias('cagr_5y'),
+        ])
+    )
+
+
+def test_cagr_matches_baseline():
+    df = panel()
+    expected = baseline_cagr(df).sort(KEYS)
+    result = (
+        cagr(df, by=KEYS)
+        .select([*KEYS, (pl.col('cagr') * 100).alias('cagr_5y')])
+        .collect()
+        .sort(KEYS)
+    )
+    assert_frame_equal(result, expected)
+
+
+def test_country_names_one_row_per_code():
+    df = country_names()
+    assert df['iso3'].n_unique() == df.height
+
+    raw = pl.read_csv(references / 'countries_br.csv', encoding='latin1', separator=';')
+    for iso in ['UMI', 'ZZZ', 'GGY', 'KNA', 'PNG']:
+        assert raw.filter(pl.col('CO_PAIS_ISOA3') == iso).height > 1
+        first = raw.filter(pl.col('CO_PAIS_ISOA3') == iso)['NO_PAIS'][0]
+        assert df.filter(pl.col('iso3') == iso)['name'].to_list() == [first]
+
+
+def test_competitor_shares_with_repeated_codes():
+    df = panel()
+    df_countries = country_names()
+    df_last = (
+        df.filter(pl.col('year') == 2023)
+        .join(df_countries.rename({'iso3': 'importer', 'name': 'importer_name'}), on='importer', how='left')
+        .join(df_countries.rename({'iso3': 'exporter', 'name': 'exporter_name'}), on='exporter', how='left')
+        .join(cagr(df, by=KEYS).collect(), on=KEYS, how='left')
+    )
+
+    # One row per (exporter, importer, sh6), and the shares of an (importer, sh6) add up to 100
+    assert df_last.height == df.filter(pl.col('year') == 2023).height
+    shares = df_last.group_by(['importer', 'sh6']).agg(
+        (pl.col('value') / pl.col('value').sum() * 100).sum().alias('total')
+    )
+    assert (shares['total'] - 100).abs().max() < 1e-9
+
+    # Every pair keeps the baseline CAGR, repeated codes included
+    expected = baseline_cagr(df).sort(KEYS)
+    result = df_last.select([*KEYS, (pl.col('cagr') * 100).alias('cagr_5y')]).sort(KEYS)
+    assert_frame_equal(result, expected, check_row_order=False)
@@ -0,0 +1,47 @@
+import random
+
+import polars as pl
+import pytest
+
+from export_potential.formatting import contabil, decimal, format_contabil, format_decimal
+
+
+@pytest.mark.parametrize('value, decimals, expected', [
+    (12.3456, 1, '12,3'),
+    (-3.21, 2, '-3,21'),
+    (0.999, 2, '1,00'),
+    (-0.0, 1, '-0,0'),
+    (2.5, 0, '2'),
+    (float('nan'), 2, 'nan'),
+    (float('-inf'), 2, '-inf'),
+])
+def test_decimal(value, decimals, expected):
+    assert format_decimal(value, decimals) == expected
+
+
+@pytest.mark.parametrize('value', [1e17, 1.5e17, 123456789012345678.9, 4241824692403708.5, 1e20, 1e30])
+@pytest.mark.parametrize('decimals', [0, 2])
+def test_decimal_large_values(value, decimals):
+    assert format_decimal(value, decimals) == f'{value:.{decimals}f}'.replace('.', ',')
+
+
+def test_contabil():
+    assert format_contabil(999.96) == '1.000,0'
+    assert format_contabil(1234567.0) == '1,2 mi'
+    assert format_contabil(2.5e9) == '2,5 bi'
+    assert format_contabil(1e21) == '1.000.000.000.000,0 bi'
+    assert format_contabil(None) == ''
+
+
+def test_columns_match_python_up_to_the_last_digit():
+    # Ties on the binary value may round the other way than Python (see the module docstring)
+    rng = random.Random(0)
+    values = [rng.uniform(-1, 1) * 10 ** rng.randint(-3, 20) for _ in range(2000)]
+    df = pl.DataFrame({'value': values}).select(
+        decimal('value', 2).alias('decimal'), contabil('value').alias('contabil')
+    )
+
+    assert df['contabil'].null_count() == 0
+    for value, text in zip(values, df['decimal']):
+        expected = f'{value:.2f}'
+        assert abs(int(text.replace(',', '')) - int(expected.replace('.', ''))) <= 1